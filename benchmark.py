@@ -0,0 +1,318 @@
+"""
+This file benchmarks the schenql-db-builder on synthetic data, so no download of the dblp is needed
+"""
+
+import argparse
+import gzip
+import os
+import random
+import tempfile
+import time
+
+import schenql_db_builder as builder
+
+DBLP_DTD = """<!ELEMENT dblp (article|inproceedings|proceedings|book|incollection|phdthesis|mastersthesis|www)*>
+<!ENTITY auml "&#228;">
+<!ENTITY ouml "&#246;">
+<!ENTITY uuml "&#252;">
+<!ENTITY eacute "&#233;">
+<!ENTITY szlig "&#223;">
+<!ENTITY ccedil "&#231;">
+<!ENTITY ndash "&#8211;">
+"""
+
+# Number of journals, conferences and institutions referenced by the synthetic data
+JOURNALS = 50
+CONFERENCES = 80
+INSTITUTIONS = 100
+
+FIRST_NAMES = ("Anna", "J&ouml;rg", "Ren&eacute;", "Maria", "Li", "Tom", "Fran&ccedil;ois", "Sven")
+LAST_NAMES = ("M&uuml;ller", "Schmidt", "Wang", "Gro&szlig;", "Smith", "Nguyen", "Ka&auml;r", "Rossi")
+
+
+def author_name(number):
+    """
+    :param number: number of the author
+    :return: unique author name containing entities of the dblp.dtd
+    """
+    return "%s %s %04d" % (FIRST_NAMES[number % len(FIRST_NAMES)], LAST_NAMES[number // len(FIRST_NAMES) %
+                                                                              len(LAST_NAMES)], number)
+
+
+def publication_key(number):
+    """
+    :param number: number of the publication
+    :return: dblp key of the synthetic publication
+    """
+    kind = number % 10
+    if kind < 5:
+        return "journals/j%d/P%d" % (number % JOURNALS, number)
+    if kind < 9:
+        return "conf/c%d/P%d" % (number % CONFERENCES, number)
+    return "phd/P%d" % number
+
+
+def generate_dblp(data_path, records, seed=0):
+    """
+    Generates a dblp.xml.gz and dblp.dtd with journal articles, conference papers, books and theses
+    as well as www records of the authors
+    :param data_path: directory the files are written to
+    :param records: number of publications
+    :param seed: seed of the random generator
+    """
+    rng = random.Random(seed)
+    authors = max(1, records // 3)
+
+    with open(os.path.join(data_path, "dblp.dtd"), "w") as dtd:
+        dtd.write(DBLP_DTD)
+
+    with gzip.open(os.path.join(data_path, "dblp.xml.gz"), "wt", encoding="iso-8859-1") as xml:
+        xml.write('<?xml version="1.0" encoding="ISO-8859-1"?>\n<!DOCTYPE dblp SYSTEM "dblp.dtd">\n<dblp>\n')
+        for i in range(records):
+            year = rng.randint(1970, 2019)
+            author_tags = "".join(
+                '<author orcid="0000-0002-%04d-%04d">%s</author>\n' % (a % 10000, a % 997, author_name(a))
+                if a % 5 == 0 else "<author>%s</author>\n" % author_name(a)
+                for a in rng.sample(range(authors), min(authors, rng.randint(1, 4))))
+            kind = i % 10
+            if kind < 5:
+                venue = "j%d" % (i % JOURNALS)
+                xml.write('<article mdate="2019-05-01" key="journals/%s/P%d">\n%s'
+                          '<title>On the <i>Complexity</i> of Problem %d &ndash;</title>\n'
+                          '<pages>1-10</pages>\n<year>%d</year>\n<volume>%d</volume>\n'
+                          '<journal>Journal %s</journal>\n<ee>https://doi.org/10.1000/%d</ee>\n'
+                          '<url>db/journals/%s/%s%d.html#P%d</url>\n</article>\n'
+                          % (venue, i, author_tags, i, year, year - 1969, venue, i, venue, venue, year, i))
+            elif kind < 9:
+                venue = "c%d" % (i % CONFERENCES)
+                xml.write('<inproceedings mdate="2019-05-01" key="conf/%s/P%d">\n%s'
+                          '<title>A Study of M&uuml;ller Systems %d</title>\n<pages>11-20</pages>\n'
+                          '<year>%d</year>\n<booktitle>%s</booktitle>\n<ee>https://doi.org/10.1001/%d</ee>\n'
+                          '<crossref>conf/%s/%d</crossref>\n<url>db/conf/%s/%s%d.html#P%d</url>\n'
+                          '</inproceedings>\n'
+                          % (venue, i, author_tags, i, year, venue.upper(), i, venue, year, venue, venue, year, i))
+            else:
+                xml.write('<phdthesis mdate="2019-05-01" key="phd/P%d">\n%s<title>Thesis %d</title>\n'
+                          '<year>%d</year>\n<school>University %d</school>\n</phdthesis>\n'
+                          % (i, author_tags, i, year, i % 20))
+        for a in range(authors):
+            notes = '<note type="affiliation">Institute %d</note>\n' % (a % INSTITUTIONS) if a % 3 == 0 else ""
+            xml.write('<www mdate="2019-05-01" key="homepages/%d/%d">\n<author>%s</author>\n'
+                      '<title>Home Page</title>\n%s<url>https://example.org/%d</url>\n</www>\n'
+                      % (a % 100, a, author_name(a), notes, a))
+        xml.write("</dblp>\n")
+
+
+def generate_institutions(data_path):
+    """
+    Generates an inst.xml with the institutions referenced by the affiliations in the synthetic dblp
+    :param data_path: directory the file is written to
+    """
+    with open(os.path.join(data_path, "inst.xml"), "w", encoding="utf-8") as xml:
+        xml.write('<?xml version="1.0" encoding="UTF-8"?>\n<institutions>\n')
+        for i in range(INSTITUTIONS):
+            xml.write('<institution key="inst/%d">\n<name>Institute %d</name>\n<name>Inst. %d</name>\n'
+                      '<location country="Germany" city="City %d" lat="49.%04d" lon="6.%04d">City %d, Germany'
+                      '</location>\n</institution>\n' % (i, i, i, i, i, i, i))
+        xml.write("</institutions>\n")
+
+
+def generate_conferences(data_path):
+    """
+    Generates a conferences.xml with the names of the conferences of the synthetic dblp
+    :param data_path: directory the file is written to
+    """
+    with open(os.path.join(data_path, "conferences.xml"), "w", encoding="utf-8") as xml:
+        xml.write('<?xml version="1.0" encoding="UTF-8"?>\n<conferences>\n')
+        for i in range(CONFERENCES):
+            xml.write("<conference>\n<acronym>C%d</acronym>\n<title>International Conference %d</title>\n"
+                      "</conference>\n" % (i, i))
+        xml.write("</conferences>\n")
+
+
+def generate_s2(data_path, records, seed=0):
+    """
+    Generates the s2-aux directory with abstracts, references and keywords of the journal articles
+    and conference papers of the synthetic dblp
+    :param data_path: directory the s2-aux directory is created in
+    :param records: number of publications of the synthetic dblp
+    :param seed: seed of the random generator
+    :return: number of generated files
+    """
+    rng = random.Random(seed)
+    counter = 0
+    for i in range(records):
+        key = publication_key(i)
+        if key.startswith("phd/"):
+            continue
+        folder = os.path.join(data_path, "s2-aux", key.rsplit("/", 1)[0])
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        cites = "".join('<cite key="%s"/>' % publication_key(rng.randrange(records)) for _ in range(rng.randint(0, 8)))
+        keywords = "".join("<keyword>keyword %d</keyword>" % rng.randrange(1000) for _ in range(rng.randint(0, 4)))
+        with open(os.path.join(folder, key.rsplit("/", 1)[1] + ".xml"), "w", encoding="utf-8") as xml:
+            xml.write('<?xml version="1.0" encoding="UTF-8"?>\n<publication key="%s">\n'
+                      "<abstract>We study problem %d and show that it can be solved in polynomial time. "
+                      "</abstract>\n%s%s\n</publication>\n" % (key, i, cites, keywords))
+        counter += 1
+    return counter
+
+
+class StandInCursor:
+    """
+    Cursor of the StandInConnection which consumes all rows without sending them anywhere
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, query, params=None):
+        pass
+
+    def executemany(self, query, rows):
+        for _ in rows:
+            self.connection.rows += 1
+
+    def close(self):
+        pass
+
+
+class StandInConnection:
+    """
+    Stand-in for the mysql connection, so build_database can be measured without a database server
+    """
+
+    def __init__(self):
+        self.rows = 0
+
+    def cursor(self, **kwargs):
+        return StandInCursor(self)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def measure(name, function, count):
+    """
+    Runs a phase of the builder and reports its throughput and peak memory
+    :param name: name of the phase
+    :param function: function running the phase
+    :param count: function returning the number of processed records after the phase finished
+    :return: dict with the results
+    """
+    exact = builder.reset_peak_rss()
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    records = count()
+    return {
+        "phase": name,
+        "records": records,
+        "seconds": elapsed,
+        "records_per_second": records / elapsed if elapsed else 0.0,
+        "peak_rss": builder.peak_rss(),
+        "exact_peak": exact,
+    }
+
+
+def benchmark_phases(data_path, s2_files, workers, sink="standin"):
+    """
+    Runs all phases of the builder on the synthetic data
+    :param data_path: directory with the synthetic data
+    :param s2_files: number of generated semantic scholar files
+    :param workers: number of worker processes
+    :param sink: "standin" loads into a StandInConnection, "sqlite" and "file" into the sinks of the builder
+    in the data directory
+    :return: list of the results of measure
+    """
+    connection = StandInConnection()
+    builder.db_connection = connection
+    if sink == "sqlite":
+        sink = builder.SQLiteSink(os.path.join(data_path, "schenql-db.sqlite"), builder.read_schema())
+    elif sink == "file":
+        sink = builder.FileSink(os.path.join(data_path, "tables"))
+    else:
+        sink = None
+    results = [
+        measure("process_institution_data", lambda: builder.process_institution_data(data_path),
+                lambda: len(builder.institutions)),
+        measure("process_s2_data", lambda: builder.process_s2_data(data_path, workers), lambda: s2_files),
+        measure("process_conference_names", lambda: builder.process_conference_names(data_path),
+                lambda: len(builder.conference_names)),
+        measure("process_dblp", lambda: builder.process_dblp(data_path, workers=workers),
+                lambda: len(builder.publications) + len(builder.person_keys)),
+        measure("build_database", lambda: builder.build_database(sink=sink),
+                lambda: connection.rows if sink is None else sum(len(rows) for _, _, rows in builder.table_data())),
+    ]
+    return results
+
+
+def benchmark_parser(data_path, engines, workers):
+    """
+    Compares the records per second of the engines of parse_dblp
+    :param data_path: directory with the generated dblp.xml.gz
+    :param engines: list of engines
+    :param workers: number of worker processes
+    """
+    for engine in engines:
+        builder.clear_dblp_data()
+        start = time.perf_counter()
+        if workers > 1:
+            builder.parse_dblp_sharded(data_path, workers, engine=engine)
+            counter = len(builder.publications) + len(builder.person_keys)
+        else:
+            with gzip.GzipFile(os.path.join(data_path, "dblp.xml.gz")) as source:
+                _, counter = builder.parse_dblp(source, engine=engine)
+        elapsed = time.perf_counter() - start
+        print("%-10s %10d records %8.2f s %12.0f records/s" % (engine, counter, elapsed, counter / elapsed))
+
+
+def print_results(results):
+    """
+    Prints the results of the phases as a table
+    :param results: list of the results of measure
+    """
+    print("\n%-26s %12s %10s %14s %12s" % ("Phase", "Records", "Seconds", "Records/s", "Peak RSS"))
+    for result in results:
+        print("%-26s %12d %10.2f %14.0f %9.1f MB%s" % (
+            result["phase"], result["records"], result["seconds"], result["records_per_second"],
+            result["peak_rss"] / 1024 / 1024, "" if result["exact_peak"] else " (process)"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarking the schenql-db-builder on synthetic data")
+    parser.add_argument("--records", type=int, default=100000, help="Number of publications (default: 100000)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random generator (default: 0)")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Number of processes (default: 1)")
+    parser.add_argument("--data", help="Directory for the synthetic data (default: temporary directory)")
+    parser.add_argument("--compare-parsers", action="store_true",
+                        help="Only compare the records/s of the parsing engines of the dblp.xml")
+    parser.add_argument("--sink", choices=("standin", "sqlite", "file"), default="standin",
+                        help="Destination of build_database, standin discards the rows (default: standin)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_path:
+        data_path = args.data or temp_path
+        os.makedirs(data_path, exist_ok=True)
+
+        print("Generating dblp.xml.gz with %d publications..." % args.records)
+        generate_dblp(data_path, args.records, args.seed)
+
+        if args.compare_parsers:
+            print("\nParsing dblp.xml.gz:")
+            benchmark_parser(data_path, ("iterparse", "target"), args.workers)
+            return
+
+        print("Generating inst.xml, conferences.xml and s2-aux...")
+        generate_institutions(data_path)
+        generate_conferences(data_path)
+        s2_files = generate_s2(data_path, args.records, args.seed)
+
+        print_results(benchmark_phases(data_path, s2_files, args.workers, args.sink))
+
+
+if __name__ == '__main__':
+    main()
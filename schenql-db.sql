@@ -113,10 +113,12 @@ CREATE TABLE IF NOT EXISTS `schenql-db`.`publication` (
   `type` ENUM('article', 'masterthesis', 'inproceedings', 'phdthesis', 'book') NULL,
   `conference_dblpKey` VARCHAR(100) COLLATE utf8mb4_bin NULL,
   `journal_dblpKey` VARCHAR(100) COLLATE utf8mb4_bin NULL,
+  `citations` INT NULL,
   PRIMARY KEY (`dblpKey`),
   INDEX `fk_publication_conference_idx` (`conference_dblpKey` ASC),
   INDEX `fk_publication_journal_idx` (`journal_dblpKey` ASC),
   INDEX `publication_year_idx` (`year`),
+  INDEX `publication_citations_idx` (`citations`),
   INDEX `type_idx` (`type`),
   INDEX `title_idx` (`title`(191)),
   FULLTEXT `fulltext_title_idx` (`title`),
@@ -347,6 +349,20 @@ CREATE TABLE IF NOT EXISTS `schenql-db`.`conference_name` (
 ENGINE = MyISAM;
 
 
+-- -----------------------------------------------------
+-- Table `schenql-db`.`venue_metrics`
+-- -----------------------------------------------------
+DROP TABLE IF EXISTS `schenql-db`.`venue_metrics` ;
+
+CREATE TABLE IF NOT EXISTS `schenql-db`.`venue_metrics` (
+  `venueKey` VARCHAR(100) COLLATE utf8mb4_bin NOT NULL,
+  `publications` INT NOT NULL,
+  `citations` INT NOT NULL,
+  `h-index` INT NOT NULL,
+  PRIMARY KEY (`venueKey`))
+ENGINE = MyISAM;
+
+
 SET SQL_MODE=@OLD_SQL_MODE;
 SET FOREIGN_KEY_CHECKS=@OLD_FOREIGN_KEY_CHECKS;
 SET UNIQUE_CHECKS=@OLD_UNIQUE_CHECKS;
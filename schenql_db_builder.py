@@ -3,11 +3,33 @@ This file downloads and builds the database for the schenql-query language
 """
 
 import argparse
+import array
+import collections
+import cProfile
+import concurrent.futures
 import configparser
+import contextlib
+import functools
 import gzip
+import hashlib
+import io
+import json
+import mmap
+import multiprocessing
 import os
+import pickle
+import queue
 import re
+import resource
+import shutil
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
 import time
+import unicodedata
+import urllib.error
 import urllib.request
 
 import mysql.connector
@@ -17,18 +39,450 @@ from lxml import etree
 # Defines how many SQL Insert statements will be executed at once
 BATCH_SIZE = 256
 
+# Number of semantic scholar files parsed by a worker at once
+S2_CHUNK_SIZE = 512
+
+# Records of the dblp.xml which are processed
+DBLP_RECORD_TAGS = ("article", "masterthesis", "phdthesis", "inproceedings", "book", "www")
+
+# Fields of dblp records which are used with their first occurrence
+DBLP_SCALAR_FIELDS = frozenset(("title", "ee", "url", "year", "volume", "journal"))
+
+# Attributes of fields of dblp records which are used
+DBLP_FIELD_ATTRIBUTES = {"author": "orcid", "note": "type"}
+
+# Venue keys of journals and conferences in the url of a publication, e.g. db/journals/acs/acs4.html#Saxena17
+JOURNAL_URL_REGEX = re.compile(r"db/(journals/.*)/")
+CONFERENCE_URL_REGEX = re.compile(r"db/(conf/.*)/")
+
+# Approximate size of the uncompressed shards of the dblp.xml parsed by a worker
+DBLP_SHARD_SIZE = 64 * 1024 * 1024
+
+# Boundaries of the top-level records in the dblp.xml used for splitting it into shards,
+# every record of the dblp.xml starts on a new line
+DBLP_ROOT_REGEX = re.compile(rb"<dblp\s*>")
+DBLP_DOCTYPE_REGEX = re.compile(rb'SYSTEM\s+"[^"]*"')
+DBLP_RECORD_REGEX = re.compile(
+    rb"\n<(?:article|inproceedings|proceedings|book|incollection|phdthesis|mastersthesis|masterthesis|www|person|data)"
+    rb"[\s>]")
+
+# Number of rows of a table inserted in one task when loading the tables concurrently
+LOAD_CHUNK_SIZE = 50000
+
+# Minimum number of seconds between two saves of the checkpoint of the database load
+CHECKPOINT_INTERVAL = 10
+
+# Size of the chunks read from a download
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Metrics of the build report with their description
+REPORT_METRICS = (
+    ("wall_seconds", "Wall time of the %s in seconds"),
+    ("cpu_seconds", "CPU time of the %s including child processes in seconds"),
+    ("rows", "Number of records or rows processed by the %s"),
+    ("rows_per_second", "Records or rows per second of the %s"),
+    ("bytes", "Size of the input parsed by the %s in bytes"),
+    ("peak_rss_bytes", "Peak resident set size during the %s in bytes"),
+)
+
+# Measurements of the phases and table loads of the current run
+build_report = {"phases": [], "tables": [], "validation": []}
+
+# Set when phases run concurrently, the process wide CPU time and peak RSS then include the other phases
+concurrent_measurements = False
+
 # Database connection
 db_connection = None
+db_config = {}
+
+# Columns of the tables filled by the builder in the order of the inserted tuples
+TABLE_COLUMNS = {
+    "institution": ("key", "primaryName", "location", "country", "city", "lat", "lon"),
+    "institution_name": ("name", "institutionKey"),
+    "person": ("dblpKey", "orcid", "primaryName"),
+    "person_names": ("name", "personKey"),
+    "person_works_for_institution": ("personKey", "institutionKey"),
+    "journal": ("dblpKey", "acronym"),
+    "journal_name": ("name", "journalKey"),
+    "conference": ("dblpKey", "acronym", "name"),
+    "publication": ("dblpKey", "title", "abstract", "ee", "url", "year", "volume", "type", "conference_dblpKey",
+                    "journal_dblpKey"),
+    "person_authored_publication": ("personKey", "publicationKey"),
+    "person_edited_publication": ("personKey", "publicationKey"),
+    "publication_references": ("pub_id", "pub2_id"),
+    "keyword": ("keyword",),
+    "publication_has_keyword": ("dblpKey", "keyword"),
+}
+
+# Unique columns and referenced tables by column of every table, checked by validate_tables.
+# Tables without a unique key in the schema are deduplicated by all columns, NULL references are valid.
+TABLE_CONSTRAINTS = {
+    "institution": ((0,), {}),
+    "institution_name": ((0,), {1: "institution"}),
+    "person": ((0,), {}),
+    "person_names": ((0,), {1: "person"}),
+    "person_works_for_institution": ((0, 1), {0: "person", 1: "institution"}),
+    "journal": ((0,), {}),
+    "journal_name": ((0,), {1: "journal"}),
+    "conference": ((0,), {}),
+    "publication": ((0,), {8: "conference", 9: "journal"}),
+    "person_authored_publication": ((0, 1), {0: "person", 1: "publication"}),
+    "person_edited_publication": ((0, 1), {0: "person", 1: "publication"}),
+    "publication_references": ((0, 1), {0: "publication", 1: "publication"}),
+    "keyword": ((0,), {}),
+    "publication_has_keyword": ((0, 1), {0: "publication", 1: "keyword"}),
+}
+
+# Tables whose rows may violate their primary key, the duplicates are skipped when loading.
+# Conferences can be found under different keys in dblp
+DUPLICATE_KEY_TABLES = {"conference"}
+
+# Tables whose key uses the case and accent insensitive default collation instead of utf8mb4_bin
+COLLATED_KEYS = {"keyword"}
+
+# Descriptions of the tables in the order they are filled
+TABLE_DESCRIPTIONS = {
+    # Institutions
+    "institution": "Adding institution keys",
+    "institution_name": "Adding institution names",
+    # DBLP
+    "person": "Person keys",
+    "person_names": "Adding person names",
+    "person_works_for_institution": "Adding affiliations of persons",
+    "journal": "Adding journals",
+    "journal_name": "Adding journal names",
+    "conference": "Adding conferences",
+    "publication": "Adding publications",
+    "person_authored_publication": "Adding authors of publications",
+    "person_edited_publication": "Adding editors of publications",
+    # Semantic Scholar
+    "publication_references": "Adding references",
+    "keyword": "Adding keywords",
+    "publication_has_keyword": "Adding keywords to publications",
+}
+
+# Processing phase that produces the data of every table, the table can be loaded once the phase is finished
+TABLE_PHASES = {
+    "institution": "process_institution_data",
+    "institution_name": "process_institution_data",
+    "person": "process_dblp",
+    "person_names": "process_dblp",
+    "person_works_for_institution": "process_dblp",
+    "journal": "process_dblp",
+    "journal_name": "process_dblp",
+    "conference": "process_dblp",
+    "publication": "process_dblp",
+    "person_authored_publication": "process_dblp",
+    "person_edited_publication": "process_dblp",
+    "publication_references": "process_s2_data",
+    "keyword": "process_s2_data",
+    "publication_has_keyword": "process_s2_data",
+}
+
+# Escape sequences of the default LOAD DATA INFILE format
+TSV_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r", "\0": "\\0"})
+
+# Entities compared by delta builds with the tables holding their rows,
+# the key column in the table and the position of the key in the inserted tuples
+DELTA_ENTITIES = {
+    "institution": (("institution", "key", 0), ("institution_name", "institutionKey", 1)),
+    "person": (("person", "dblpKey", 0), ("person_names", "personKey", 1),
+               ("person_works_for_institution", "personKey", 0)),
+    "journal": (("journal", "dblpKey", 0), ("journal_name", "journalKey", 1)),
+    "conference": (("conference", "dblpKey", 0),),
+    "publication": (("publication", "dblpKey", 0), ("person_authored_publication", "publicationKey", 1),
+                    ("person_edited_publication", "publicationKey", 1), ("publication_references", "pub_id", 0),
+                    ("publication_has_keyword", "dblpKey", 0)),
+    "keyword": (("keyword", "keyword", 0),),
+}
+
+# Format of the files in the snapshot cache of the processed data
+SNAPSHOT_MAGIC = b"SCHENQL-COLUMNS\n"
+SNAPSHOT_VERSION = b"2"
+
+# Schema of the database and the parts of it read by read_schema
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schenql-db.sql")
+SQL_COMMENT_REGEX = re.compile(r"^\s*--.*$", re.MULTILINE)
+CREATE_TABLE_REGEX = re.compile(r"CREATE TABLE IF NOT EXISTS\s+(?:`[^`]+`\.)?`([^`]+)`\s*\((.*?)\)\s*(ENGINE[^;]*);",
+                                re.DOTALL)
+SCHEMA_QUALIFIER_REGEX = re.compile(r"`[^`]+`\.(?=`)")
+
+# MySQL specific parts of the schema which are converted for the SQLiteSink
+SQLITE_REMOVED_REGEX = re.compile(r"\s+(?:CHARACTER SET|COLLATE)\s+\w+", re.IGNORECASE)
+SQLITE_ENUM_REGEX = re.compile(r"\bENUM\s*\([^)]*\)", re.IGNORECASE)
+SQLITE_AUTO_INCREMENT_REGEX = re.compile(r"\bAUTO_INCREMENT\b", re.IGNORECASE)
+SQLITE_INDEX_REGEX = re.compile(r"(UNIQUE\s+)?(?:INDEX|KEY)\s+`([^`]+)`\s*(\(.*\))$", re.IGNORECASE | re.DOTALL)
+SQLITE_PREFIX_LENGTH_REGEX = re.compile(r"`\(\d+\)")
+
+# Tables which are streamed into the database while the dblp is parsed
+STREAMED_TABLES = ("publication", "person", "person_works_for_institution", "person_authored_publication",
+                   "person_edited_publication")
+
+
+class StringPool:
+    """
+    Interns strings like dblp keys and author names and maps them to dense integer ids,
+    so every distinct string is only held once in memory
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def __len__(self):
+        return len(self.strings)
+
+    def intern(self, string):
+        """
+        :param string: string to intern
+        :return: id of the string
+        """
+        string_id = self.ids.get(string)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.ids[string] = string_id
+            self.strings.append(string)
+        return string_id
+
+    def clear(self):
+        """
+        Removes all strings, the ids handed out before are invalid afterwards
+        """
+        self.ids.clear()
+        del self.strings[:]
+
+    def canonical(self, string):
+        """
+        :param string: string to intern
+        :return: the interned instance of the string
+        """
+        return self.strings[self.intern(string)]
+
+
+class EdgeList:
+    """
+    List of (key, key) tuples where both keys are interned in a StringPool and stored as ids in two typed arrays.
+    Behaves like a list of tuples, the strings are only materialized when the rows are read.
+    """
+
+    def __init__(self, pool, rows=()):
+        self.pool = pool
+        self.left = array.array("I")
+        self.right = array.array("I")
+        self.extend(rows)
+
+    def __len__(self):
+        return len(self.left)
+
+    def __iter__(self):
+        strings = self.pool.strings
+        for left, right in zip(self.left, self.right):
+            yield strings[left], strings[right]
+
+    def __getitem__(self, index):
+        strings = self.pool.strings
+        if isinstance(index, slice):
+            return [(strings[left], strings[right]) for left, right in zip(self.left[index], self.right[index])]
+        return strings[self.left[index]], strings[self.right[index]]
+
+    def __setitem__(self, index, row):
+        self.left[index] = self.pool.intern(row[0])
+        self.right[index] = self.pool.intern(row[1])
+
+    def __reduce__(self):
+        # The ids are only valid in the pool of this process, other processes receive the strings
+        return edge_list_from_rows, (list(self),)
+
+    def append(self, row):
+        self.left.append(self.pool.intern(row[0]))
+        self.right.append(self.pool.intern(row[1]))
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def clear(self):
+        del self.left[:]
+        del self.right[:]
+
+    def translate(self, column, mapping):
+        """
+        Replaces the keys of one column by their value in a dict, e.g. author names by the dblpKey of the person.
+        Rows with a key without a value are removed.
+        :param column: 0 or 1
+        :param mapping: dict of string -> string
+        :return: number of removed rows
+        """
+        ids, other = (self.left, self.right) if column == 0 else (self.right, self.left)
+        strings = self.pool.strings
+        translated = {}
+        kept = 0
+        for i, string_id in enumerate(ids):
+            new_id = translated.get(string_id)
+            if new_id is None:
+                string = strings[string_id]
+                # -1 marks keys without a value, it is never an id of the pool
+                new_id = translated[string_id] = self.pool.intern(mapping[string]) if string in mapping else -1
+            if new_id != -1:
+                other[kept] = other[i]
+                ids[kept] = new_id
+                kept += 1
+        removed = len(ids) - kept
+        del self.left[kept:]
+        del self.right[kept:]
+        return removed
+
+
+def edge_list_from_rows(rows):
+    """
+    Creates an EdgeList in the global string pool, used for unpickling
+    :param rows: list of tuples
+    :return: EdgeList
+    """
+    return EdgeList(string_pool, rows)
+
+
+class AbstractStore:
+    """
+    Stores the abstracts of publications on disk instead of in memory. The abstracts are appended to a blob file,
+    the index is a memory-mapped hash table mapping the hash of a dblp key to the position of its abstract.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path of the store, the files path.blob and path.idx are created
+        """
+        self.path = path
+        self.blob = None
+        self.entries = {}
+        self.blob_map = None
+        self.index_map = None
+        self.capacity = 0
+        self.size = 0
+
+    def __len__(self):
+        return len(self.entries) if self.index_map is None else self.size
+
+    def open(self):
+        """
+        Creates an empty store for writing
+        """
+        self.blob = open(self.path + ".blob", "wb")
+        self.entries = {}
+
+    def add(self, key, abstract):
+        """
+        Appends an abstract to the blob file, a later abstract for the same key replaces the earlier one
+        :param key: dblp key of the publication
+        :param abstract: text of the abstract
+        """
+        encoded_key = key.encode("utf-8")
+        data = abstract.encode("utf-8")
+        self.entries[key] = (self.blob.tell(), len(data))
+        self.blob.write(struct.pack("<I", len(encoded_key)))
+        self.blob.write(encoded_key)
+        self.blob.write(data)
+
+    def finish(self):
+        """
+        Writes the index of the abstracts and opens the store for reading
+        """
+        self.blob.close()
+        self.blob = None
+        # A load factor of at most 0.5 keeps the probe sequences short
+        capacity = max(16, 2 * len(self.entries))
+        slots = array.array("Q", bytes(24 * capacity))
+        for key, (offset, length) in self.entries.items():
+            key_hash = self._hash(key)
+            slot = key_hash % capacity
+            while slots[3 * slot]:
+                slot = (slot + 1) % capacity
+            slots[3 * slot:3 * slot + 3] = array.array("Q", (key_hash, offset, length))
+        with open(self.path + ".idx", "wb") as index_file:
+            index_file.write(struct.pack("<QQ", capacity, len(self.entries)))
+            slots.tofile(index_file)
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        """
+        Opens an existing store for reading
+        """
+        with open(self.path + ".idx", "rb") as index_file:
+            self.index_map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.capacity, self.size = struct.unpack_from("<QQ", self.index_map)
+        with open(self.path + ".blob", "rb") as blob_file:
+            self.blob_map = mmap.mmap(blob_file.fileno(), 0, access=mmap.ACCESS_READ) \
+                if os.fstat(blob_file.fileno()).st_size else b""
+
+    def get(self, key):
+        """
+        :param key: dblp key of the publication
+        :return: abstract of the publication or None
+        """
+        if key is None:
+            return None
+        key_hash = self._hash(key)
+        encoded_key = key.encode("utf-8")
+        slot = key_hash % self.capacity
+        while True:
+            slot_hash, offset, length = struct.unpack_from("<QQQ", self.index_map, 16 + 24 * slot)
+            if not slot_hash:
+                return None
+            if slot_hash == key_hash:
+                key_length, = struct.unpack_from("<I", self.blob_map, offset)
+                start = offset + 4 + key_length
+                if self.blob_map[offset + 4:start] == encoded_key:
+                    return self.blob_map[start:start + length].decode("utf-8")
+            slot = (slot + 1) % self.capacity
+
+    @staticmethod
+    def _hash(key):
+        # 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") | 1
+
+
+class PublicationRows:
+    """
+    Rows of the publication table which read the abstracts from an AbstractStore when they are accessed
+    """
+
+    def __init__(self, rows, store):
+        """
+        :param rows: publication tuples without abstracts
+        :param store: AbstractStore with the abstracts
+        """
+        self.rows = rows
+        self.store = store
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        for row in self.rows:
+            yield self._with_abstract(row)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._with_abstract(row) for row in self.rows[index]]
+        return self._with_abstract(self.rows[index])
+
+    def _with_abstract(self, row):
+        return row[:2] + (self.store.get(row[0]),) + row[3:]
+
 
 # Defining global variables - probably should have used a class here
 
+# Interned dblp keys, names and keywords of the edge tables
+string_pool = StringPool()
+
 # DBLP Variables
 affiliations = []
 journal_key_dict = {}
 journal_name_dict = {}
 publications = []
-person_authored = []
-person_edited = []
+person_authored = EdgeList(string_pool)
+person_edited = EdgeList(string_pool)
 person_keys = []
 person_names = {}
 
@@ -41,23 +495,585 @@ conference_key_dict = {}
 conference_names = {}
 
 # Semantic Scholar Variables
-pub_references_pub2 = []
+pub_references_pub2 = EdgeList(string_pool)
 keywords = set()
-pub_keywords = []
+pub_keywords = EdgeList(string_pool)
 abstracts = {}
+abstract_store = None
+
+# Selection of the publications of a subset build, None builds the whole dblp
+subset_filter = None
+
+
+def reset_peak_rss():
+    """
+    Resets the peak resident set size of the process, only supported on Linux
+    :return: True if the peak was reset
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss():
+    """
+    :return: peak resident set size of the process in bytes
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def cpu_time():
+    """
+    :return: CPU time used by the process and its terminated child processes in seconds
+    """
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def input_size(path):
+    """
+    :param path: path of a file or a directory
+    :return: size of the file or of all files in the directory in bytes
+    """
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    size = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            size += os.path.getsize(os.path.join(root, name))
+    return size
+
+
+@contextlib.contextmanager
+def instrument(kind, name, path=None):
+    """
+    Measures a phase or a table load and adds the measurement to build_report.
+    The number of processed rows has to be set in the yielded dict.
+    :param kind: "phases" or "tables"
+    :param name: name of the phase or table
+    :param path: optional input file or directory of the phase whose size is reported as bytes parsed
+    :return: context manager yielding the measurement
+    """
+    measurement = {"name": name, "rows": 0}
+    # Resetting the peak would also reset it for the measurements running at the same time
+    exact_peak = False if concurrent_measurements else reset_peak_rss()
+    wall_start = time.perf_counter()
+    cpu_start = cpu_time()
+    yield measurement
+    measurement["wall_seconds"] = time.perf_counter() - wall_start
+    measurement["cpu_seconds"] = cpu_time() - cpu_start
+    measurement["rows_per_second"] = measurement["rows"] / measurement["wall_seconds"] \
+        if measurement["wall_seconds"] else 0.0
+    if path is not None and os.path.exists(path):
+        measurement["bytes"] = input_size(path)
+    # Without resetting the peak it is the peak of the whole process so far
+    measurement["peak_rss_bytes"] = peak_rss()
+    measurement["exact_peak_rss"] = exact_peak
+    if concurrent_measurements:
+        measurement["overlapping"] = True
+    build_report[kind].append(measurement)
+
+
+def write_report(path):
+    """
+    Writes build_report as JSON
+    :param path: path of the report
+    """
+    with open(path + ".tmp", "w") as report_file:
+        json.dump(build_report, report_file, indent=2)
+    os.replace(path + ".tmp", path)
+    print("Build report written to", path)
+
+
+def write_prometheus_report(path):
+    """
+    Writes build_report in the text format of the Prometheus node exporter textfile collector
+    :param path: path of the .prom file
+    """
+    lines = []
+    for kind, label in (("phases", "phase"), ("tables", "table")):
+        for field, description in REPORT_METRICS:
+            measurements = [measurement for measurement in build_report[kind] if field in measurement]
+            if not measurements:
+                continue
+            metric = "schenql_builder_%s_%s" % (label, field)
+            lines.append("# HELP %s %s" % (metric, description % label))
+            lines.append("# TYPE %s gauge" % metric)
+            for measurement in measurements:
+                lines.append('%s{%s="%s"} %s' % (metric, label, measurement["name"], float(measurement[field])))
+    for field in ("duplicates", "orphans"):
+        if not build_report["validation"]:
+            break
+        metric = "schenql_builder_validation_%s" % field
+        lines.append("# HELP %s Number of %s removed from the table by the validation" % (metric, field))
+        lines.append("# TYPE %s gauge" % metric)
+        for counts in build_report["validation"]:
+            lines.append('%s{table="%s"} %s' % (metric, counts["name"], float(counts[field])))
+    lines.append("# HELP schenql_builder_finished_timestamp_seconds Time the build finished")
+    lines.append("# TYPE schenql_builder_finished_timestamp_seconds gauge")
+    lines.append("schenql_builder_finished_timestamp_seconds %s" % float(time.time()))
+    with open(path + ".tmp", "w") as prometheus_file:
+        prometheus_file.write("\n".join(lines) + "\n")
+    os.replace(path + ".tmp", path)
+    print("Prometheus metrics written to", path)
+
+
+def connect_db():
+    """
+    Opens a new connection to the database configured in db_config
+    :return: mysql connection
+    """
+    return mysql.connector.connect(**db_config)
+
+
+def estimate_size(rows):
+    """
+    Roughly estimates the memory used by a list of row tuples
+    :param rows: list of tuples
+    :return: size in bytes
+    """
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+class StreamingLoader:
+    """
+    Streams rows into the database while the data is still being processed.
+    Every table gets its own insert worker with its own database connection which is fed
+    with batches through a queue. The amount of memory used by queued batches is bounded
+    by memory_limit, if the limit is reached the producer blocks until the workers caught up.
+    Rows that can only be inserted after parsing finished are spooled to disk.
+    """
+
+    def __init__(self, tables, memory_limit, spool_path):
+        """
+        :param tables: names of the tables that are streamed
+        :param memory_limit: maximum size of all queued batches in bytes
+        :param spool_path: directory for the spool files of deferred rows
+        """
+        self.table_limit = max(1, memory_limit // len(tables))
+        self.spool_path = spool_path
+        self.buffers = {table: [] for table in tables}
+        self.queues = {table: queue.Queue() for table in tables}
+        self.queued_bytes = {table: 0 for table in tables}
+        self.counts = {table: 0 for table in tables}
+        self.spools = {}
+        self.errors = []
+        self.condition = threading.Condition()
+        self.threads = [threading.Thread(target=self._worker, args=(table,), daemon=True) for table in tables]
+        for thread in self.threads:
+            thread.start()
+
+    def put(self, table, row):
+        """
+        Adds a row to the table, full batches are handed over to the insert worker
+        :param table: name of the table
+        :param row: tuple in the column order of TABLE_COLUMNS
+        """
+        buffer = self.buffers[table]
+        buffer.append(row)
+        if len(buffer) >= BATCH_SIZE:
+            self._flush(table)
+
+    def defer(self, table, row):
+        """
+        Spools a row to disk which has to be processed after parsing finished
+        :param table: name of the table
+        :param row: tuple which can be pickled
+        """
+        if table not in self.spools:
+            self.spools[table] = ([], tempfile.TemporaryFile(dir=self.spool_path))
+        buffer, spool = self.spools[table]
+        buffer.append(row)
+        if len(buffer) >= BATCH_SIZE * 16:
+            pickle.dump(buffer, spool, pickle.HIGHEST_PROTOCOL)
+            buffer.clear()
+
+    def deferred(self, table):
+        """
+        Reads back all rows spooled with defer, the spool file is removed afterwards
+        :param table: name of the table
+        :return: generator of the spooled rows
+        """
+        if table not in self.spools:
+            return
+        buffer, spool = self.spools.pop(table)
+        if buffer:
+            pickle.dump(buffer, spool, pickle.HIGHEST_PROTOCOL)
+        spool.seek(0)
+        with spool:
+            while True:
+                try:
+                    rows = pickle.load(spool)
+                except EOFError:
+                    break
+                yield from rows
+
+    def close(self):
+        """
+        Flushes the remaining rows and waits for all insert workers to finish
+        """
+        for table in self.buffers:
+            if self.buffers[table]:
+                self._flush(table)
+            self.queues[table].put(None)
+        for thread in self.threads:
+            thread.join()
+        if self.errors:
+            raise self.errors[0]
+        for table, count in self.counts.items():
+            print("Streamed %d rows into %s" % (count, table))
+
+    def _flush(self, table):
+        batch = self.buffers[table]
+        self.buffers[table] = []
+        size = estimate_size(batch)
+        with self.condition:
+            # Block while the queue of this table is over its share of the memory limit
+            while self.queued_bytes[table] and self.queued_bytes[table] + size > self.table_limit:
+                if self.errors:
+                    break
+                self.condition.wait()
+            if self.errors:
+                raise self.errors[0]
+            self.queued_bytes[table] += size
+        self.queues[table].put((batch, size))
+
+    def _worker(self, table):
+        connection = None
+        try:
+            connection = connect_db()
+            cur = connection.cursor()
+            query = insert_query(table)
+            while True:
+                item = self.queues[table].get()
+                if item is None:
+                    break
+                batch, size = item
+                cur.executemany(query, batch)
+                connection.commit()
+                with self.condition:
+                    self.queued_bytes[table] -= size
+                    self.counts[table] += len(batch)
+                    self.condition.notify_all()
+            cur.close()
+        except Exception as e:
+            with self.condition:
+                self.errors.append(e)
+                self.condition.notify_all()
+        finally:
+            if connection is not None:
+                connection.close()
+
+
+class ConnectionPool:
+    """
+    Pool of database connections which are opened on demand and shared between threads
+    """
+
+    def __init__(self, size):
+        """
+        :param size: maximum number of open connections
+        """
+        self.size = size
+        self.opened = 0
+        self.idle = []
+        self.condition = threading.Condition()
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        Borrows a connection from the pool, blocks if all connections are in use.
+        A connection which raised an error is closed instead of being returned to the pool.
+        :return: context manager yielding the connection
+        """
+        with self.condition:
+            while not self.idle and self.opened >= self.size:
+                self.condition.wait()
+            connection = self.idle.pop() if self.idle else None
+            if connection is None:
+                self.opened += 1
+        if connection is None:
+            try:
+                connection = connect_db()
+            except Exception:
+                self.release()
+                raise
+        try:
+            yield connection
+        except Exception:
+            # The connection may be broken or in the middle of a transaction, a new one is opened on demand
+            try:
+                connection.close()
+            except Exception:
+                pass
+            self.release()
+            raise
+        with self.condition:
+            self.idle.append(connection)
+            self.condition.notify()
+
+    def release(self):
+        """
+        Frees the slot of a connection that was not returned to the pool
+        """
+        with self.condition:
+            self.opened -= 1
+            self.condition.notify()
+
+    def close(self):
+        """
+        Closes all idle connections of the pool
+        """
+        with self.condition:
+            while self.idle:
+                self.idle.pop().close()
+
+
+class TaskGraph:
+    """
+    Runs tasks in threads as soon as all tasks they depend on are finished.
+    With one thread the tasks run in the order they were added, as far as their dependencies allow.
+    """
+
+    def __init__(self):
+        self.tasks = {}
+
+    def add(self, name, function, dependencies=(), exclusive=False):
+        """
+        :param name: unique name of the task
+        :param function: function called without arguments
+        :param dependencies: names of the tasks that have to be finished before the task is started
+        :param exclusive: run the task while no other task is running, e.g. because it forks worker processes
+        """
+        self.tasks[name] = (function, tuple(dependencies), exclusive)
+
+    def run(self, threads=1):
+        """
+        Runs all tasks. The exception of a failed task is raised once the running tasks are finished,
+        the tasks that were not started yet are skipped.
+        :param threads: maximum number of tasks running at the same time
+        """
+        waiting = dict(self.tasks)
+        running = {}
+        finished = set()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+            while waiting or running:
+                blocked = any(self.tasks[name][2] for name in running.values())
+                for name, (function, dependencies, exclusive) in list(waiting.items()):
+                    if blocked or not finished.issuperset(dependencies):
+                        continue
+                    if exclusive and running:
+                        # No further tasks are started until the exclusive task can run
+                        blocked = True
+                        continue
+                    running[executor.submit(function)] = name
+                    del waiting[name]
+                    blocked = exclusive
+                if not running:
+                    raise ValueError("Unknown or cyclic dependencies of the tasks: %s" % ", ".join(waiting))
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    future.result()
+                    finished.add(name)
+
+
+def read_download_meta(path):
+    """
+    Reads the validators of a previous download of a file
+    :param path: path of the downloaded file
+    :return: dict with etag, last_modified and complete
+    """
+    try:
+        with open(path + ".meta") as meta_file:
+            return json.load(meta_file)
+    except (OSError, ValueError):
+        return {}
 
 
-def download_dblp(dblp_url, dblp_dtd_url, data_path):
+def write_download_meta(path, meta):
     """
-    Downloading the dblp.xml.gz to the specified data_path for further processing
+    Saves the validators of the download of a file
+    :param path: path of the downloaded file
+    :param meta: dict with etag, last_modified and complete
+    """
+    with open(path + ".meta.tmp", "w") as meta_file:
+        json.dump(meta, meta_file)
+    os.replace(path + ".meta.tmp", path + ".meta")
+
+
+class DownloadStream(io.RawIOBase):
+    """
+    Readable stream of a download which writes the received data to a partial file while it is read.
+    A resumed download first returns the data of the partial file. When the download is complete
+    the partial file replaces the target file.
+    """
+
+    def __init__(self, response, path, offset, meta):
+        """
+        :param response: response of the download request
+        :param path: path the file is saved to
+        :param offset: number of bytes already downloaded to the partial file
+        :param meta: validators of the download
+        """
+        super().__init__()
+        self.response = response
+        self.path = path
+        self.name = path
+        self.meta = meta
+        self.expected = None
+        if response.headers.get("Content-Length") is not None:
+            self.expected = offset + int(response.headers["Content-Length"])
+        self.received = offset
+        self.existing = open(path + ".part", "rb") if offset else None
+        self.existing_left = offset
+        self.part = open(path + ".part", "ab" if offset else "wb")
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.existing is not None:
+            count = self.existing.readinto(memoryview(buffer)[:min(len(buffer), self.existing_left)])
+            self.existing_left -= count
+            if count and self.existing_left:
+                return count
+            self.existing.close()
+            self.existing = None
+            if count:
+                return count
+        if self.response is None:
+            return 0
+        data = self.response.read(len(buffer))
+        if not data:
+            self._finish()
+            return 0
+        self.part.write(data)
+        self.received += len(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+    def _finish(self):
+        self.response.close()
+        self.response = None
+        self.part.close()
+        if self.expected is not None and self.received != self.expected:
+            raise IOError("Download of %s incomplete: %d of %d bytes" % (self.path, self.received, self.expected))
+        os.replace(self.path + ".part", self.path)
+        self.meta["complete"] = True
+        write_download_meta(self.path, self.meta)
+
+    def close(self):
+        if self.existing is not None:
+            self.existing.close()
+        if self.response is not None:
+            self.response.close()
+        self.part.close()
+        super().close()
+
+
+def open_download(url, path):
+    """
+    Starts a download which is skipped if the file did not change since the last download (ETag/If-Modified-Since)
+    and resumes an interrupted download with an HTTP Range request
+    :param url: URL of the file
+    :param path: path the file is saved to
+    :return: DownloadStream or None if the file did not change
+    """
+    meta = read_download_meta(path)
+    validator = meta.get("etag") or meta.get("last_modified")
+    headers = {}
+    offset = 0
+    if meta.get("complete") and os.path.exists(path):
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    elif validator and os.path.exists(path + ".part"):
+        offset = os.path.getsize(path + ".part")
+        headers["Range"] = "bytes=%d-" % offset
+        # The whole file is sent if it changed since the partial download
+        headers["If-Range"] = validator
+
+    try:
+        response = urllib.request.urlopen(urllib.request.Request(url, headers=headers))
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return None
+        if e.code == 416:
+            # The partial file is invalid, start over
+            os.remove(path + ".part")
+            write_download_meta(path, {})
+            return open_download(url, path)
+        raise
+
+    if response.status == 206:
+        print("Resuming download of %s at %d bytes" % (url, offset))
+    else:
+        offset = 0
+        meta = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+    meta["complete"] = False
+    write_download_meta(path, meta)
+    return DownloadStream(response, path, offset, meta)
+
+
+def download_file(url, path):
+    """
+    Downloads a file with open_download
+    :param url: URL of the file
+    :param path: path the file is saved to
+    :return: False if the file did not change since the last download
+    """
+    stream = open_download(url, path)
+    if stream is None:
+        return False
+    with stream:
+        buffer = bytearray(DOWNLOAD_CHUNK_SIZE)
+        while stream.readinto(buffer):
+            pass
+    return True
+
+
+def download_dblp(dblp_url, dblp_dtd_url, data_path, tee=False):
+    """
+    Downloading the dblp.xml.gz to the specified data_path for further processing.
+    Files which did not change since the last download are skipped.
     :param dblp_url: URL to the dblp.xml.gz file (probably: https://dblp.uni-trier.de/xml/dblp.xml.gz)
     :param dblp_dtd_url: URL to the dblp.dtd file (probably: https://dblp.uni-trier.de/xml/dblp.dtd)
     :param data_path: Path where the dblp.xml.gz file is saved to
+    :param tee: do not wait for the download of the dblp.xml.gz but return a stream of it for the parser
+    :return: DownloadStream of the dblp.xml.gz if tee is set and the file changed, otherwise None
     """
     print("Downloading dblp.xml.gz...")
-    urllib.request.urlretrieve(dblp_url, os.path.join(data_path, "dblp.xml.gz"))
-    urllib.request.urlretrieve(dblp_dtd_url, os.path.join(data_path, "dblp.dtd"))
+    # The dtd is needed before parsing starts
+    if not download_file(dblp_dtd_url, os.path.join(data_path, "dblp.dtd")):
+        print("dblp.dtd did not change since the last download")
+    if tee:
+        stream = open_download(dblp_url, os.path.join(data_path, "dblp.xml.gz"))
+        if stream is None:
+            print("dblp.xml.gz did not change since the last download")
+        else:
+            print("dblp.xml.gz is downloaded while it is parsed")
+        return stream
+    if not download_file(dblp_url, os.path.join(data_path, "dblp.xml.gz")):
+        print("dblp.xml.gz did not change since the last download")
     print("Downloading dblp DONE!")
+    return None
 
 
 def cleanup_db():
@@ -78,48 +1094,285 @@ def cleanup_db():
     print("""Cleanup DONE!""")
 
 
-def process_dblp(data_path):
+class SubsetFilter:
     """
-    Builds mysql-database from dblp.xml
-    :param data_path: path to dblp.xml.gz
+    Selects the publications of a subset build by year, type, venue key prefix and a deterministic sample
+    of the dblp keys, so every process and every build selects the same publications
     """
-    print("Processing dblp file...")
+
+    def __init__(self, years=None, types=None, venues=None, sample=None):
+        """
+        :param years: optional tuple of the first and last year, None for an open end
+        :param types: optional publication types like "article"
+        :param venues: optional prefixes of the venue keys like "conf/sigmod"
+        :param sample: optional fraction of the publications between 0 and 1
+        """
+        self.years = years
+        self.types = frozenset(types) if types else None
+        self.venues = tuple(venue.rstrip("/") for venue in venues) if venues else None
+        self.venue_prefixes = tuple(venue + "/" for venue in self.venues) if venues else None
+        self.sample = sample
+
+    def __repr__(self):
+        return "SubsetFilter(years=%r, types=%r, venues=%r, sample=%r)" % (
+            self.years, sorted(self.types) if self.types else None, self.venues, self.sample)
+
+    def keeps_key(self, dblp_key, url=None):
+        """
+        Checks the criteria that only depend on the key, which are already known for the semantic scholar data.
+        Venues are matched against whole segments of the dblp key and the db/ url of the publication,
+        so conf/icde does not select conf/icdew.
+        :param dblp_key: key of the publication
+        :param url: optional url of the publication in the dblp
+        :return: True if the publication can be part of the subset
+        """
+        if self.venues is not None and not self.matches_venue(dblp_key) \
+                and not (url and url.startswith("db/") and self.matches_venue(url[3:])):
+            return False
+        return self.keeps_sample(dblp_key)
+
+    def matches_venue(self, key):
+        """
+        :param key: dblp key or path of the url of a publication
+        :return: True if the key is one of the venues or in one of them
+        """
+        return key.startswith(self.venue_prefixes) or key in self.venues
+
+    def keeps_sample(self, dblp_key):
+        """
+        Checks only the sample, which is the same for every record of the publication
+        :param dblp_key: key of the publication
+        :return: True if the publication is part of the sample
+        """
+        if self.sample is None:
+            return True
+        digest = hashlib.blake2b(dblp_key.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little") < self.sample * 2 ** 64
+
+    def keeps(self, dblp_key, tag_type, year, url):
+        """
+        :param dblp_key: key of the publication
+        :param tag_type: type of the publication
+        :param year: year of the publication or None
+        :param url: url of the publication in the dblp or None
+        :return: True if the publication is part of the subset
+        """
+        if self.types is not None and tag_type not in self.types:
+            return False
+        if self.years is not None:
+            first, last = self.years
+            if year is None or (first is not None and year < first) or (last is not None and year > last):
+                return False
+        return self.keeps_key(dblp_key, url)
+
+
+def parse_years(value):
+    """
+    Parses a year range of the command line like 2015-2020, 2015- or -2000
+    :param value: year or range of years
+    :return: tuple of the first and last year, None for an open end
+    """
+    first, separator, last = value.partition("-")
+    if not separator:
+        last = first
+    try:
+        return int(first) if first else None, int(last) if last else None
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid year range: %r" % value)
+
+
+def prune_subset():
+    """
+    Removes the persons, names, affiliations, abstracts, references and keywords that are not reached from the
+    publications of a subset build
+    """
+    ids = string_pool.ids
+    kept_publications = {ids[row[0]] for row in publications if row[0] in ids}
+    for pub_key in [pub_key for pub_key in abstracts if ids.get(pub_key) not in kept_publications]:
+        del abstracts[pub_key]
+    kept_persons = set(person_authored.left)
+    kept_persons.update(person_edited.left)
+    strings = string_pool.strings
+    person_set = {strings[person] for person in kept_persons}
+
+    restore_table("person", [row for row in person_keys if row[0] in person_set])
+    restore_table("person_names", [row for row in person_names.items() if row[1] in person_set])
+    restore_table("person_works_for_institution", [row for row in affiliations if row[0] in person_set])
+    restore_table("publication_references", [
+        (strings[left], strings[right]) for left, right in zip(pub_references_pub2.left, pub_references_pub2.right)
+        if left in kept_publications and right in kept_publications])
+    restore_table("publication_has_keyword", [
+        (strings[left], strings[right]) for left, right in zip(pub_keywords.left, pub_keywords.right)
+        if left in kept_publications])
+    restore_table("keyword", {(keyword,) for _, keyword in pub_keywords})
+    print("Subset of %d publications, %d persons and %d references" % (
+        len(publications), len(person_keys), len(pub_references_pub2)))
+
+
+class DblpRecord:
+    """
+    Flat representation of a dblp record, scalar fields hold the text of their first occurrence
+    """
+    __slots__ = ("tag", "key", "seen", "title", "ee", "url", "year", "volume", "journal", "authors", "editors",
+                 "notes")
+
+    def __init__(self, tag, key):
+        self.tag = tag
+        self.key = key
+        self.seen = set()
+        self.title = None
+        self.ee = None
+        self.url = None
+        self.year = None
+        self.volume = None
+        self.journal = None
+        self.authors = []
+        self.editors = []
+        self.notes = []
+
+    def add_field(self, tag, text, attribute):
+        """
+        Adds a child element of the record
+        :param tag: tag of the child
+        :param text: text of the child before its first subelement
+        :param attribute: the orcid of authors or the type of notes
+        """
+        if tag == "author":
+            self.authors.append((text, attribute))
+        elif tag == "editor":
+            self.editors.append(text)
+        elif tag == "note":
+            self.notes.append((attribute, text))
+        elif tag in DBLP_SCALAR_FIELDS and tag not in self.seen:
+            self.seen.add(tag)
+            setattr(self, tag, text)
+
+
+def record_from_element(elem):
+    """
+    Extracts a DblpRecord in one pass over the children of an element
+    :param elem: element of a dblp record
+    :return: DblpRecord
+    """
+    record = DblpRecord(elem.tag, elem.get("key"))
+    for child in elem:
+        tag = child.tag
+        record.add_field(tag, child.text, child.get(DBLP_FIELD_ATTRIBUTES[tag]) if tag in DBLP_FIELD_ATTRIBUTES
+                         else None)
+    return record
+
+
+class DblpTarget:
+    """
+    Parser target for lxml which extracts DblpRecords from the events of the parser without building a tree
+    """
+
+    def __init__(self, handle_record):
+        """
+        :param handle_record: function called with every DblpRecord
+        """
+        self.handle_record = handle_record
+        self.depth = 0
+        self.record = None
+        self.field = None
+        self.attribute = None
+        self.text = None
+        self.collect = False
+        self.counter = 0
+
+    def start(self, tag, attrib):
+        self.depth += 1
+        if self.depth == 2:
+            self.record = DblpRecord(tag, attrib.get("key")) if tag in DBLP_RECORD_TAGS else None
+        elif self.depth == 3 and self.record is not None:
+            self.field = tag
+            self.attribute = attrib.get(DBLP_FIELD_ATTRIBUTES[tag]) if tag in DBLP_FIELD_ATTRIBUTES else None
+            self.text = []
+            self.collect = True
+        else:
+            # Only the text before the first subelement is used like the text of an element
+            self.collect = False
+
+    def data(self, data):
+        if self.collect:
+            self.text.append(data)
+
+    def end(self, tag):
+        if self.depth == 3 and self.record is not None:
+            self.record.add_field(self.field, "".join(self.text) if self.text else None, self.attribute)
+            self.collect = False
+        elif self.depth == 2 and self.record is not None:
+            self.counter += 1
+            self.handle_record(self.record)
+            self.record = None
+        self.depth -= 1
+
+    def close(self):
+        return self.counter
+
+
+def parse_dblp(source, loader=None, bar=None, unresolved_orcids=None, engine="iterparse"):
+    """
+    Parses dblp records from a xml file and adds them to the global variables
+    :param source: file object of a xml file in the format of the dblp.xml
+    :param loader: optional StreamingLoader, publications, persons, affiliations and the authors and editors
+    of publications are streamed into the database instead of being collected in memory
+    :param bar: optional progressbar which is updated for every record
+    :param unresolved_orcids: optional dict which receives the names of all persons without an orcid by their key
+    :param engine: "iterparse" builds an element for every record, "target" extracts the records from the
+    parser events with a DblpTarget
+    :return: tuple of the orcids found for author names and the number of parsed records
+    """
+    if loader is None:
+        add_publication = publications.append
+        add_person = person_keys.append
+        add_affiliation = affiliations.append
+        add_author = person_authored.append
+        add_editor = person_edited.append
+    else:
+        add_publication = lambda row: loader.put("publication", row)
+        add_person = lambda row: loader.put("person", row)
+        add_affiliation = lambda row: loader.put("person_works_for_institution", row)
+        add_author = lambda row: loader.defer("person_authored_publication", row)
+        add_editor = lambda row: loader.defer("person_edited_publication", row)
+
+    # Keys and names are shared with the edge tables. Streamed rows leave the process,
+    # so their strings are not kept in the pool for the whole run
+    intern_string = string_pool.canonical if loader is None else sys.intern
 
     orcids = {}
     orcid_regex = re.compile(r"0000-000(1-[5-9]|2-[0-9]|3-[0-4])\d{3}-\d{3}[\dX]")
-
-    context = etree.iterparse(gzip.GzipFile(os.path.join(data_path, "dblp.xml.gz")),
-                              tag=("article", "masterthesis", "phdthesis", "inproceedings", "book", "www"),
-                              load_dtd=True,
-                              encoding='iso-8859-1')
-    bar = progressbar.ProgressBar(max_value=progressbar.UnknownLength)
     counter = 0
 
-    for _, elem in context:
+    def handle_record(record):
+        nonlocal counter
         counter += 1
-        bar.update(counter)
+        if bar is not None:
+            bar.update(counter)
 
-        dblp_key = elem.get("key")
-        tag_type = elem.tag
+        dblp_key = intern_string(record.key)
+        tag_type = record.tag
 
         # Processing publications
-        if elem.tag in ("article", "inproceedings", "masterthesis", "phdthesis", "book"):
-            title = elem.find("title").text if elem.find("title") is not None else None
-            ee = elem.find("ee").text if elem.find("ee") is not None else None
-            url = elem.find("url").text if elem.find("url") is not None else None
-            year = int(elem.find("year").text) if elem.find("year") is not None else None
-            volume = elem.find("volume").text if elem.find("volume") is not None else None
+        if tag_type != "www":
+            title = record.title
+            ee = record.ee
+            url = record.url
+            year = int(record.year) if record.year is not None else None
+            volume = record.volume
+            if subset_filter is not None and not subset_filter.keeps(dblp_key, tag_type, year, url):
+                return
             conference_key = None
             journal_key = None
 
             if title:
                 title = title.encode('utf-8').decode('latin-1')
 
-            if elem.find("journal") is not None:
-                journal = elem.find("journal").text
+            if "journal" in record.seen:
+                journal = record.journal
                 # Use the url tag if its available and starts with "db/journals"
                 if url and url.startswith("db/journals/"):
-                    result = re.search("db/(.*)/.*", url)
+                    result = JOURNAL_URL_REGEX.match(url)
                     if result:
                         journal_key = result.group(1)
                 elif dblp_key.startswith("journals"):
@@ -143,9 +1396,9 @@ def process_dblp(data_path):
                     if journal not in journal_name_dict:
                         journal_name_dict[journal] = journal_key
 
-            elif elem.tag == "inproceedings":
+            elif tag_type == "inproceedings":
                 if url and url.startswith("db/conf/"):
-                    result = re.search("db/(.*)/.*", url)
+                    result = CONFERENCE_URL_REGEX.match(url)
                     if result:
                         conference_key = result.group(1)
                 elif dblp_key.startswith("conf"):
@@ -169,12 +1422,14 @@ def process_dblp(data_path):
                             conference_names[acronym.lower()] if acronym.lower() in conference_names else None
                         )
 
-            authors = elem.findall("author")
-            editors = elem.findall("editor")
-            abstract = abstracts[dblp_key] if dblp_key in abstracts else None
+            if loader is not None and abstract_store is not None:
+                # Streamed rows are not read through PublicationRows
+                abstract = abstract_store.get(dblp_key)
+            else:
+                abstract = abstracts[dblp_key] if dblp_key in abstracts else None
 
             # Adding the publications
-            publications.append(
+            add_publication(
                 (
                     dblp_key,
                     title,
@@ -190,54 +1445,283 @@ def process_dblp(data_path):
             )
 
             # Adding authors to the publication
-            for person in authors:
-                if person.get("orcid"):
+            for name, orcid in record.authors:
+                if orcid:
                     # TODO: This is not 100% correct, but it will work for most cases
-                    orcid = person.get("orcid")
                     orcid = orcid_regex.search(orcid)
                     if orcid:
-                        orcids[person.text] = orcid.group()
-                person_authored.append((person.text, dblp_key))
+                        orcids[name] = orcid.group()
+                add_author((name, dblp_key))
 
             # Adding editors to the publication
-            for person in editors:
-                person_edited.append((person.text, dblp_key))
+            for name in record.editors:
+                add_editor((name, dblp_key))
 
         # Processing person records
-        if elem.tag == "www":
-            if dblp_key and dblp_key.startswith("homepages/"):
-                primary_name = elem.find("author").text if elem.find("author") is not None else None
-
-                # Add all available names to person record
-                orcid = None
-                persons = elem.findall("author")
-                for person in persons:
-                    if orcid is None and person.text in orcids:
-                        orcid = orcids[person.text]
-                    person_names[person.text] = dblp_key
-
-                person_keys.append((dblp_key, orcid, primary_name))
-
-                # Add institutions
-                notes = elem.findall("note")
-                for note in notes:
-                    if note.get("type") == "affiliation":
-                        if note.text in inst_names:
-                            affiliations.append((dblp_key, inst_names[note.text]))
-
-        # Freeing the element since it is not needed anymore
-        elem.clear()
+        elif dblp_key and dblp_key.startswith("homepages/"):
+            names = [name for name, _ in record.authors]
+            primary_name = names[0] if names else None
+
+            # Add all available names to person record
+            orcid = None
+            for name in names:
+                if orcid is None and name in orcids:
+                    orcid = orcids[name]
+                person_names[intern_string(name)] = dblp_key
+
+            if orcid is None and loader is not None:
+                # The orcid might be found in a publication after the person record
+                loader.defer("person", ((dblp_key, orcid, primary_name), names))
+            else:
+                add_person((dblp_key, orcid, primary_name))
+            if orcid is None and unresolved_orcids is not None:
+                unresolved_orcids[dblp_key] = names
+
+            # Add institutions
+            for note_type, text in record.notes:
+                if note_type == "affiliation":
+                    if text in inst_names:
+                        add_affiliation((dblp_key, inst_names[text]))
+
+    if engine == "target":
+        parser = etree.XMLParser(target=DblpTarget(handle_record), load_dtd=True, encoding='iso-8859-1')
+        etree.parse(source, parser)
+    else:
+        context = etree.iterparse(source, tag=DBLP_RECORD_TAGS, load_dtd=True, encoding='iso-8859-1')
+        for _, elem in context:
+            handle_record(record_from_element(elem))
+
+            # Freeing the element since it is not needed anymore
+            elem.clear()
+
+    return orcids, counter
+
+
+def split_dblp(data_path, shard_path, shard_size, max_pending):
+    """
+    Decompresses the dblp.xml.gz once and splits it at the boundaries of top-level records into
+    standalone xml files which reference the dblp.dtd by its absolute path
+    :param data_path: path to dblp.xml.gz
+    :param shard_path: directory the shards are written to
+    :param shard_size: approximate size of a shard in bytes
+    :param max_pending: semaphore limiting the number of shards on disk which were not parsed yet
+    :return: generator of the paths of the shards
+    """
+    dtd_path = os.path.abspath(os.path.join(data_path, "dblp.dtd"))
+    header = None
+    buffer = b""
+    number = 0
+    eof = False
+
+    with gzip.GzipFile(os.path.join(data_path, "dblp.xml.gz")) as source:
+        while not eof:
+            chunk = source.read(shard_size)
+            eof = not chunk
+            buffer += chunk
+
+            if header is None:
+                root = DBLP_ROOT_REGEX.search(buffer)
+                if root is None:
+                    if eof:
+                        raise ValueError("No <dblp> element found in dblp.xml.gz")
+                    continue
+                header = DBLP_DOCTYPE_REGEX.sub(lambda match: b'SYSTEM "' + dtd_path.encode() + b'"',
+                                                buffer[:root.end()]) + b"\n"
+                buffer = buffer[root.end():]
+
+            if eof:
+                end = buffer.rfind(b"</dblp>")
+                body, buffer = buffer[:end if end >= 0 else len(buffer)], b""
+            else:
+                # Everything before the start of the last record in the buffer consists of complete records
+                last = None
+                for last in DBLP_RECORD_REGEX.finditer(buffer):
+                    pass
+                if last is None:
+                    continue
+                body, buffer = buffer[:last.start() + 1], buffer[last.start() + 1:]
+
+            if not body.strip():
+                continue
+            max_pending.acquire()
+            number += 1
+            path = os.path.join(shard_path, "dblp-%05d.xml" % number)
+            with open(path, "wb") as shard:
+                shard.write(header)
+                shard.write(body)
+                shard.write(b"\n</dblp>\n")
+            yield path
+
+
+def clear_dblp_data():
+    """
+    Removes all data of a previous processing of the dblp from the global variables
+    """
+    for collection in (publications, person_authored, person_edited, person_keys, affiliations, person_names,
+                       journal_key_dict, journal_name_dict, conference_key_dict):
+        collection.clear()
+
+
+def parse_dblp_shard(path, engine="iterparse"):
+    """
+    Parses a shard written by split_dblp in a worker process of process_dblp
+    :param path: path to the shard, the file is removed afterwards
+    :param engine: parsing engine of parse_dblp
+    :return: dict of the parsed data of the shard
+    """
+    # The worker has its own copy of the global variables, only the results of this shard are returned.
+    # The edge lists are returned as strings, so the pool of the worker only has to hold the current shard.
+    clear_dblp_data()
+    string_pool.clear()
+
+    unresolved_orcids = {}
+    with open(path, "rb") as source:
+        orcids, counter = parse_dblp(source, unresolved_orcids=unresolved_orcids, engine=engine)
+    os.remove(path)
+
+    return {
+        "counter": counter,
+        "orcids": orcids,
+        "unresolved_orcids": unresolved_orcids,
+        "publications": publications,
+        "person_authored": person_authored,
+        "person_edited": person_edited,
+        "person_keys": person_keys,
+        "affiliations": affiliations,
+        "person_names": person_names,
+        "journal_key_dict": journal_key_dict,
+        "journal_name_dict": journal_name_dict,
+        "conference_key_dict": conference_key_dict,
+    }
+
+
+def parse_dblp_sharded(data_path, workers, bar=None, engine="iterparse"):
+    """
+    Parses the dblp.xml.gz in worker processes and merges the results in the order of the file
+    :param data_path: path to dblp.xml.gz
+    :param workers: number of worker processes
+    :param bar: optional progressbar which is updated after every shard
+    :param engine: parsing engine of parse_dblp
+    :return: number of parsed records
+    """
+    orcids = {}
+    unresolved_orcids = {}
+    counter = 0
+    max_pending = threading.BoundedSemaphore(workers * 2)
+    shard_path = tempfile.mkdtemp(prefix="dblp-shards-", dir=data_path)
+
+    try:
+        with multiprocessing.Pool(workers) as pool:
+            shards = split_dblp(data_path, shard_path, DBLP_SHARD_SIZE, max_pending)
+            for result in pool.imap(functools.partial(parse_dblp_shard, engine=engine), shards):
+                max_pending.release()
+                publications.extend(result["publications"])
+                person_authored.extend(result["person_authored"])
+                person_edited.extend(result["person_edited"])
+                person_keys.extend(result["person_keys"])
+                affiliations.extend(result["affiliations"])
+                person_names.update(result["person_names"])
+                orcids.update(result["orcids"])
+                unresolved_orcids.update(result["unresolved_orcids"])
+                # The first occurrence of journals and conferences wins like in the serial parsing
+                for key, value in result["journal_key_dict"].items():
+                    journal_key_dict.setdefault(key, value)
+                for key, value in result["journal_name_dict"].items():
+                    journal_name_dict.setdefault(key, value)
+                for key, value in result["conference_key_dict"].items():
+                    conference_key_dict.setdefault(key, value)
+                counter += result["counter"]
+                if bar is not None:
+                    bar.update(counter)
+    finally:
+        shutil.rmtree(shard_path, ignore_errors=True)
+
+    # Orcids are taken from the authors of publications, which might have been parsed in another shard
+    resolve_orcids(orcids, unresolved_orcids)
+    return counter
+
+
+def find_orcid(names, orcids):
+    """
+    :param names: names of a person in the order of the person record
+    :param orcids: orcids found for author names by parse_dblp
+    :return: orcid of the first name that has one or None
+    """
+    for name in names:
+        if name in orcids:
+            return orcids[name]
+    return None
+
+
+def resolve_orcids(orcids, unresolved_orcids):
+    """
+    Adds the orcids of the whole dblp to the persons, so the person table does not depend on whether
+    the publications of a person were parsed before or after the person record
+    :param orcids: orcids found for author names by parse_dblp
+    :param unresolved_orcids: names of the persons without an orcid by their key
+    """
+    for i in range(0, len(person_keys)):
+        dblp_key, orcid, primary_name = person_keys[i]
+        if orcid is None and dblp_key in unresolved_orcids:
+            orcid = find_orcid(unresolved_orcids[dblp_key], orcids)
+            if orcid is not None:
+                person_keys[i] = (dblp_key, orcid, primary_name)
+
+
+def process_dblp(data_path, loader=None, workers=1, engine="iterparse", source=None):
+    """
+    Builds mysql-database from dblp.xml
+    :param data_path: path to dblp.xml.gz
+    :param loader: optional StreamingLoader, publications, persons, affiliations and the authors and editors
+    of publications are streamed into the database instead of being collected in memory
+    :param workers: number of processes parsing shards of the dblp.xml, not supported in streaming mode
+    :param engine: parsing engine of parse_dblp, "iterparse" or "target"
+    :param source: optional stream of the dblp.xml.gz which is parsed instead of the file, e.g. a DownloadStream
+    :return: number of parsed records
+    """
+    print("Processing dblp file...")
+
+    bar = progressbar.ProgressBar(max_value=progressbar.UnknownLength)
+    # The orcids of persons are resolved against the whole dblp like in parse_dblp_sharded
+    unresolved_orcids = None if loader is not None else {}
+    if workers > 1 and loader is None and source is None:
+        counter = parse_dblp_sharded(data_path, workers, bar, engine)
+    else:
+        if source is not None:
+            with source:
+                orcids, counter = parse_dblp(gzip.GzipFile(fileobj=source), loader, bar, unresolved_orcids, engine)
+        else:
+            orcids, counter = parse_dblp(gzip.GzipFile(os.path.join(data_path, "dblp.xml.gz")), loader, bar,
+                                         unresolved_orcids, engine)
+        if loader is None:
+            resolve_orcids(orcids, unresolved_orcids)
 
     # Finishing the progressbar
     bar.finish()
 
-    # Replace author names with dblpKeys in person_authored
-    for i in range(0, len(person_authored)):
-        person_authored[i] = (person_names[person_authored[i][0]], person_authored[i][1])
-
-    # Replace author names with dblpKeys in person_edited
-    for i in range(0, len(person_edited)):
-        person_edited[i] = (person_names[person_edited[i][0]], person_edited[i][1])
+    if loader is not None:
+        for row, names in loader.deferred("person"):
+            dblp_key, _, primary_name = row
+            loader.put("person", (dblp_key, find_orcid(names, orcids), primary_name))
+        # Authors and editors can only be inserted once all names of the persons are known
+        missing = 0
+        for table in ("person_authored_publication", "person_edited_publication"):
+            for name, pub_key in loader.deferred(table):
+                if name in person_names:
+                    loader.put(table, (person_names[name], pub_key))
+                else:
+                    missing += 1
+        if missing:
+            print("Removed %d authors and editors without a person record" % missing)
+        return counter
+
+    # Replace author names with dblpKeys in person_authored and person_edited
+    missing = person_authored.translate(0, person_names) + person_edited.translate(0, person_names)
+    if missing:
+        print("Removed %d authors and editors without a person record" % missing)
+    if subset_filter is not None:
+        prune_subset()
+    return counter
 
 
 def process_institution_data(data_path):
@@ -276,58 +1760,128 @@ def process_institution_data(data_path):
         elem.clear()
 
 
-def process_s2_data(data_path):
+def parse_s2_file(file_path):
+    """
+    Parses a single xml file of the semantic scholar dataset
+    :param file_path: path to the xml file
+    :return: tuple of (pub_key, abstract, cited keys, keywords) or None if the file could not be used
+    """
+    try:
+        tree = etree.parse(file_path)
+    except etree.XMLSyntaxError:
+        print("\nXML Syntax Error in:", file_path)
+        return None
+    xml_root = tree.getroot()
+    pub_key = xml_root.get("key")
+    if not pub_key:
+        return pub_key, None, (), ()
+
+    # Sometimes there are two abstracts for one publication, just using the first to find
+    abstract = xml_root.find("abstract")
+    if abstract is not None:
+        abstract = abstract.text.strip()
+
+    # Sometimes there are cites to same publication
+    cited_pubs = dict.fromkeys(cite.get("key") for cite in xml_root.findall("cite") if cite.get("key"))
+
+    # Getting all unique keywords for the publication
+    keywords_of_pub = dict.fromkeys(k_tag.text for k_tag in xml_root.findall("keyword") if k_tag.text)
+
+    return pub_key, abstract, tuple(cited_pubs), tuple(keywords_of_pub)
+
+
+def parse_s2_files(file_paths):
+    """
+    Parses a chunk of semantic scholar files, used by the worker processes of process_s2_data
+    :param file_paths: list of paths to xml files
+    :return: list of the results of parse_s2_file
+    """
+    return [result for result in map(parse_s2_file, file_paths) if result is not None]
+
+
+def merge_s2_results(results):
+    """
+    Adds the parsed semantic scholar files to the global variables
+    :param results: list of the results of parse_s2_file
+    """
+    for pub_key, abstract, cited_pubs, keywords_of_pub in results:
+        if not pub_key:
+            continue
+        # The venue and url of the publication are only known in the dblp, prune_subset removes the data
+        # of the publications that are not part of the subset
+        if subset_filter is not None and not subset_filter.keeps_sample(pub_key):
+            continue
+        if abstract is not None:
+            if abstract_store is not None:
+                abstract_store.add(pub_key, abstract)
+            else:
+                abstracts[pub_key] = abstract
+        for cite in cited_pubs:
+            pub_references_pub2.append((pub_key, cite))
+        for keyword in keywords_of_pub:
+            keywords.add((keyword,))
+            pub_keywords.append((pub_key, keyword))
+
+
+def s2_file_chunks(data_path, measurement=None):
+    """
+    Walks through the semantic scholar dataset and collects the relevant files in chunks
+    :param data_path: path of the s2 dataset
+    :param measurement: optional measurement of instrument which receives the size of the files as bytes
+    :return: generator of lists of file paths
+    """
+    folder_regex = re.compile("/(journals|conf|phd|books)/")
+    chunk = []
+    for root, dirs, files in os.walk(os.path.join(data_path, "s2-aux")):
+        if folder_regex.search(root):
+            for name in files:
+                chunk.append(os.path.join(root, name))
+                if measurement is not None:
+                    measurement["bytes"] = measurement.get("bytes", 0) + os.path.getsize(chunk[-1])
+                if len(chunk) >= S2_CHUNK_SIZE:
+                    yield chunk
+                    chunk = []
+    if chunk:
+        yield chunk
+
+
+def process_s2_data(data_path, workers=1, measurement=None):
     """
     Processing additional semantic scholar data and connecting it with it's references in the dblp
     :param data_path: path of the s2 dataset
+    :param workers: number of processes parsing the files
+    :param measurement: optional measurement of instrument which receives the size of the parsed files as bytes,
+    so the dataset does not have to be walked again
+    :return: number of parsed files
     """
     print("\nProcessing semantic scholar data. This may take some time...")
-    folder_regex = re.compile("/(journals|conf|phd|books)/")
 
     bar = progressbar.ProgressBar(max_value=progressbar.UnknownLength)
     counter = 0
 
-    for root, dirs, files in os.walk(os.path.join(data_path, "s2-aux")):
-        for name in files:
-            if folder_regex.search(root):
-                file_path = os.path.join(root, name)
-                try:
-                    tree = etree.parse(file_path)
-                except etree.XMLSyntaxError:
-                    print("\nXML Syntax Error in:", file_path)
-                    continue
-                xml_root = tree.getroot()
-                pub_key = xml_root.get("key")
-                counter += 1
+    if workers > 1:
+        # The chunks are merged in the order of the file walk so the result equals the serial processing
+        # The workers do not need the data of the parent, so they are not forked from a process whose other
+        # threads might be parsing or loading at the same time
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        with context.Pool(workers) as pool:
+            for results in pool.imap(parse_s2_files, s2_file_chunks(data_path, measurement)):
+                merge_s2_results(results)
+                counter += len(results)
                 bar.update(counter)
-                if pub_key:
-                    # Sometimes there are two abstracts for one publication, just using the first to find
-                    abstract = xml_root.find("abstract")
-                    if abstract is not None:
-                        abstracts[pub_key] = abstract.text.strip()
-
-                    # Sometimes there are cites to same publication
-                    cites = xml_root.findall("cite")
-                    cited_pubs = set()
-                    for cite in cites:
-                        cited_pub = cite.get("key")
-                        if cited_pub:
-                            cited_pubs.add(cited_pub)
-                    for cite in cited_pubs:
-                        pub_references_pub2.append((pub_key, cite))
-
-                    # Getting all unique keywords for the publication
-                    keyword_tags = xml_root.findall("keyword")
-                    keywords_of_pub = set()
-                    for k_tag in keyword_tags:
-                        keyword = k_tag.text
-                        if keyword:
-                            keywords_of_pub.add(keyword)
-                    for keyword in keywords_of_pub:
-                        keywords.add((keyword,))
-                        pub_keywords.append((pub_key, keyword))
+    else:
+        for chunk in s2_file_chunks(data_path, measurement):
+            results = parse_s2_files(chunk)
+            merge_s2_results(results)
+            counter += len(results)
+            bar.update(counter)
     bar.finish()
 
+    if abstract_store is not None:
+        abstract_store.finish()
+    return counter
+
 
 def process_conference_names(data_path):
     """
@@ -348,148 +1902,1316 @@ def process_conference_names(data_path):
         elem.clear()
 
 
-def build_database():
+def insert_query(table):
+    """
+    Builds the INSERT statement for a table based on TABLE_COLUMNS
+    :param table: name of the table
+    :return: parametrized INSERT query
+    """
+    columns = TABLE_COLUMNS[table]
+    return """INSERT INTO `%s` (%s) VALUES (%s)""" % (
+        table,
+        ", ".join("`%s`" % column for column in columns),
+        ", ".join(["%s"] * len(columns))
+    )
+
+
+def insert_rows(cur, table, rows, progress=None, start=0):
+    """
+    Inserts rows into a table in batches of BATCH_SIZE while showing a progressbar.
+    Rows of the DUPLICATE_KEY_TABLES that violate a unique constraint are skipped.
+    :param cur: cursor of the database connection
+    :param table: name of the table
+    :param rows: list of tuples in the column order of TABLE_COLUMNS
+    :param progress: optional function called with the number of rows of every inserted batch
+    instead of showing a progressbar
+    :param start: index of the first row to insert, e.g. when resuming an interrupted load
+    """
+    query = insert_query(table)
+    with progressbar.ProgressBar(max_value=len(rows)) if progress is None else contextlib.nullcontext() as bar:
+        for i in range(start, len(rows), BATCH_SIZE):
+            batch = rows[i:i + BATCH_SIZE]
+            try:
+                cur.executemany(query, batch)
+            except mysql.connector.errors.IntegrityError:
+                if table not in DUPLICATE_KEY_TABLES:
+                    raise
+                # Only skip the rows of the batch that violate the constraint
+                for row in batch:
+                    try:
+                        cur.execute(query, row)
+                    except mysql.connector.errors.IntegrityError:
+                        pass
+            if progress is None:
+                bar.update(i)
+            else:
+                progress(len(batch))
+
+
+def load_tables_concurrently(tables, connections, spool_path=None):
+    """
+    Loads the tables over a pool of database connections with load_table, the largest tables are started first
+    :param tables: list of (table, description, rows) tuples like returned by table_data
+    :param connections: number of database connections
+    :param spool_path: if set, every table is bulk loaded from a spool file in one task
+    """
+    global concurrent_measurements
+    pool = ConnectionPool(connections)
+    graph = TaskGraph()
+    for table, _, rows in sorted(tables, key=lambda table: len(table[2]), reverse=True):
+        graph.add(table, functools.partial(load_table, pool, table, spool_path, rows))
+    overlapping = concurrent_measurements
+    concurrent_measurements = True
+    try:
+        graph.run(connections)
+    finally:
+        concurrent_measurements = overlapping
+        pool.close()
+
+
+def load_table(pool, table, spool_path=None, rows=None):
+    """
+    Loads one table over the connections of a pool. Large tables are split into chunks of LOAD_CHUNK_SIZE rows
+    which are inserted in parallel, every chunk is committed on its own.
+    :param pool: ConnectionPool
+    :param table: name of the table
+    :param spool_path: if set, the table is bulk loaded from a spool file in this directory in one chunk
+    :param rows: rows of the table, collected with table_rows if not given
+    """
+    if rows is None:
+        rows = table_rows(table)
+    step = len(rows) if spool_path is not None else LOAD_CHUNK_SIZE
+    chunks = [(start, min(start + step, len(rows))) for start in range(0, len(rows), max(step, 1))] or [(0, 0)]
+
+    def load(start, end):
+        with pool.connection() as connection:
+            cur = connection.cursor()
+            if spool_path is not None:
+                bulk_load_rows(cur, table, rows, spool_path)
+            else:
+                insert_rows(cur, table, rows[start:end], progress=lambda count: None)
+            connection.commit()
+            cur.close()
+
+    with instrument("tables", table) as measurement:
+        if len(chunks) > 1:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=pool.size) as executor:
+                for future in [executor.submit(load, start, end) for start, end in chunks]:
+                    future.result()
+        else:
+            load(*chunks[0])
+        measurement["rows"] = len(rows)
+    print("Loaded %s (%d rows)" % (table, len(rows)))
+
+
+def escape_tsv_value(value):
+    """
+    Escapes a value for a tab separated file in the default format of LOAD DATA INFILE
+    :param value: value of a row
+    :return: escaped string, NULL is written as \\N
+    """
+    if value is None:
+        return "\\N"
+    return str(value).translate(TSV_ESCAPES)
+
+
+def write_spool_file(path, rows):
+    """
+    Writes rows into a tab separated spool file which can be loaded with LOAD DATA INFILE
+    :param path: path of the spool file
+    :param rows: list of tuples
+    """
+    with open(path, "w", encoding="utf-8", newline="\n") as spool:
+        for row in rows:
+            spool.write("\t".join(escape_tsv_value(value) for value in row))
+            spool.write("\n")
+
+
+def bulk_load_rows(cur, table, rows, spool_path):
+    """
+    Loads the rows into a table by writing them into a spool file and loading it with LOAD DATA LOCAL INFILE.
+    All tables of the schema are MyISAM so updating the non-unique indexes is deferred until all rows are loaded.
+    :param cur: cursor of a database connection opened with allow_local_infile
+    :param table: name of the table
+    :param rows: list of tuples in the column order of TABLE_COLUMNS
+    :param spool_path: directory the spool file is written to
+    """
+    path = os.path.abspath(os.path.join(spool_path, table + ".tsv"))
+    write_spool_file(path, rows)
+    if not rows:
+        return
+    cur.execute("""ALTER TABLE `%s` DISABLE KEYS""" % table)
+    try:
+        cur.execute("""LOAD DATA LOCAL INFILE %%s INTO TABLE `%s` CHARACTER SET utf8mb4
+                        FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' (%s)""" % (
+            table, ", ".join("`%s`" % column for column in TABLE_COLUMNS[table])), (path,))
+    finally:
+        # Queries would fall back to full table scans while the keys are disabled
+        cur.execute("""ALTER TABLE `%s` ENABLE KEYS""" % table)
+    print("Loaded %d rows from %s" % (len(rows), path))
+
+
+def table_rows(table):
+    """
+    Collects the processed data of one table
+    :param table: name of the table
+    :return: rows of the table in the column order of TABLE_COLUMNS
+    """
+    if table == "institution_name":
+        return list(inst_names.items())
+    if table == "person_names":
+        return list(person_names.items())
+    if table == "journal":
+        return list(journal_key_dict.items())
+    if table == "journal_name":
+        return list(journal_name_dict.items())
+    if table == "conference":
+        return list(conference_key_dict.values())
+    if table == "publication":
+        return publications if abstract_store is None else PublicationRows(publications, abstract_store)
+    if table == "keyword":
+        return sorted(keywords)
+    return {
+        "institution": institutions,
+        "person": person_keys,
+        "person_works_for_institution": affiliations,
+        "person_authored_publication": person_authored,
+        "person_edited_publication": person_edited,
+        "publication_references": pub_references_pub2,
+        "publication_has_keyword": pub_keywords,
+    }[table]
+
+
+def table_data():
+    """
+    Collects the processed data of all tables in the order they are filled
+    :return: list of (table, description, rows) tuples
+    """
+    return [(table, description, table_rows(table)) for table, description in TABLE_DESCRIPTIONS.items()]
+
+
+def validate_edges(edges, references, known_keys):
+    """
+    Finds the invalid rows of an EdgeList by the ids of the keys, so no tuples have to be created
+    :param edges: EdgeList, deduplicated by both columns
+    :param references: referenced tables by column, see TABLE_CONSTRAINTS
+    :param known_keys: dict of table -> set of the keys of the valid rows
+    :return: dict of row index -> reason
+    """
+    ids = edges.pool.ids
+    strings = edges.pool.strings
+    known_ids = {}
+    for column, table in references.items():
+        if table in COLLATED_KEYS:
+            column_ids = set(edges.left if column == 0 else edges.right)
+            known_ids[column] = {i for i in column_ids if collation_key(strings[i]) in known_keys[table]}
+        else:
+            known_ids[column] = {ids[key] for key in known_keys[table] if key in ids}
+    left_ids = known_ids.get(0)
+    right_ids = known_ids.get(1)
+    seen = set()
+    rejected = {}
+    for i, (left, right) in enumerate(zip(edges.left, edges.right)):
+        if left_ids is not None and left not in left_ids:
+            rejected[i] = "unknown %s" % references[0]
+        elif right_ids is not None and right not in right_ids:
+            rejected[i] = "unknown %s" % references[1]
+        else:
+            edge = (left << 32) | right
+            if edge in seen:
+                rejected[i] = "duplicate"
+            else:
+                seen.add(edge)
+    return rejected
+
+
+def collation_key(value):
+    """
+    Approximates the comparison of the default collation of the schema, which ignores case, accents and
+    trailing spaces, so the keys the database treats as equal are found before the load
+    :param value: string
+    :return: string that is the same for all values the collation treats as equal
+    """
+    value = unicodedata.normalize("NFKD", value.rstrip(" "))
+    return "".join(char for char in value if not unicodedata.combining(char)).casefold()
+
+
+def validate_rows(rows, unique, references, known_keys, collated=False):
+    """
+    Finds the duplicate rows and the rows that reference unknown keys
+    :param rows: list of tuples in the column order of TABLE_COLUMNS
+    :param unique: unique columns, see TABLE_CONSTRAINTS
+    :param references: referenced tables by column, see TABLE_CONSTRAINTS
+    :param known_keys: dict of table -> set of the keys of the valid rows, collated keys by their collation_key
+    :param collated: compare the unique columns by their collation_key, see COLLATED_KEYS
+    :return: dict of row index -> reason
+    """
+    seen = set()
+    rejected = {}
+    for i, row in enumerate(rows):
+        for column, table in references.items():
+            value = row[column]
+            if value is not None and table in COLLATED_KEYS:
+                value = collation_key(value)
+            if value is not None and value not in known_keys[table]:
+                rejected[i] = "unknown %s" % table
+                break
+        else:
+            key = tuple(collation_key(row[column]) if collated else row[column] for column in unique)
+            if key in seen:
+                rejected[i] = "duplicate"
+            else:
+                seen.add(key)
+    return rejected
+
+
+def validate_tables(quarantine_path):
+    """
+    Checks the unique keys and the references of all tables before they are loaded, so the database can be
+    loaded with all checks disabled. Tables are checked in load order against the keys of the valid rows of
+    the tables before, the invalid rows are removed and written to a spool file per table with the reason
+    as first column. The numbers of removed rows are added to build_report.
+    :param quarantine_path: directory the removed rows are written to
+    """
+    print("\nValidating tables...")
+    shutil.rmtree(quarantine_path, ignore_errors=True)
+    known_keys = {}
+    for table, _, rows in table_data():
+        unique, references = TABLE_CONSTRAINTS[table]
+        if isinstance(rows, EdgeList):
+            rejected = validate_edges(rows, references, known_keys)
+        else:
+            rejected = validate_rows(rows, unique, references, known_keys, table in COLLATED_KEYS)
+
+        duplicates = sum(1 for reason in rejected.values() if reason == "duplicate")
+        build_report["validation"].append({"name": table, "rows": len(rows) - len(rejected),
+                                           "duplicates": duplicates, "orphans": len(rejected) - duplicates})
+
+        # The publications are filtered without their abstracts
+        valid = publications if table == "publication" else rows
+        if rejected:
+            print("%s: removed %d duplicates and %d rows with unknown references" % (
+                table, duplicates, len(rejected) - duplicates))
+            os.makedirs(quarantine_path, exist_ok=True)
+            write_spool_file(os.path.join(quarantine_path, table + ".tsv"),
+                             ((reason,) + tuple(rows[i]) for i, reason in sorted(rejected.items())))
+            valid = [row for i, row in enumerate(valid) if i not in rejected]
+            restore_table(table, valid)
+        if unique == (0,):
+            known_keys[table] = {collation_key(row[0]) if table in COLLATED_KEYS else row[0] for row in valid}
+    print("Validating tables DONE!")
+
+
+class LoadCheckpoint:
+    """
+    Records the progress of build_database in a JSON file, so an interrupted load can be resumed.
+    For every table the number of rows it had before the load started is saved, the number of rows
+    already loaded is taken from the table itself, because rows committed after the last save of the
+    checkpoint are in the table as well. The checkpoint is only valid for the same input files and options,
+    a checkpoint of other input files or options is stale until the tables were cleared and reset was called.
+    """
+
+    def __init__(self, path, fingerprint, options=None):
+        """
+        Loads the checkpoint of a previous load if it was made for the same input files and options
+        :param path: path to the checkpoint file
+        :param fingerprint: fingerprint of the input files computed by input_fingerprint
+        :param options: options of the build that change which rows are loaded, like {"validate": True}
+        """
+        self.path = path
+        self.fingerprint = fingerprint
+        self.options = options or {}
+        self.tables = {}
+        self.stale = False
+        self.saved = time.monotonic()
+        try:
+            with open(path) as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+        except (OSError, ValueError):
+            return
+        if checkpoint.get("fingerprint") == fingerprint and checkpoint.get("options", {}) == self.options:
+            self.tables = checkpoint["tables"]
+            print("Resuming the interrupted load of", path)
+        else:
+            self.stale = True
+
+    def reset(self):
+        """
+        Forgets the progress of the previous load, e.g. because the tables were cleared
+        """
+        self.tables = {}
+        self.stale = False
+
+    def save(self):
+        """
+        Atomically replaces the checkpoint file
+        """
+        with open(self.path + ".tmp", "w") as checkpoint_file:
+            json.dump({"fingerprint": self.fingerprint, "options": self.options, "tables": self.tables},
+                      checkpoint_file)
+        os.replace(self.path + ".tmp", self.path)
+        self.saved = time.monotonic()
+
+    def remove(self):
+        """
+        Removes the checkpoint file after the load was completed
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def is_done(self, table):
+        """
+        :param table: name of the table
+        :return: True if the table was completely loaded
+        """
+        return self.tables.get(table, {}).get("done", False)
+
+    def start(self, cur, table):
+        """
+        Starts or resumes the load of a table
+        :param cur: cursor of the database connection
+        :param table: name of the table
+        :return: index of the first row that still has to be loaded
+        """
+        cur.execute("""SELECT COUNT(*) FROM `%s`""" % table)
+        count = cur.fetchone()[0]
+        if table not in self.tables:
+            self.tables[table] = {"base": count, "offset": 0, "done": False}
+            self.save()
+            return 0
+        offset = max(count - self.tables[table]["base"], 0)
+        print("Resuming at row %d (last checkpoint at row %d)" % (offset, self.tables[table]["offset"]))
+        return offset
+
+    def update(self, table, offset):
+        """
+        Saves the number of loaded rows of a table at most every CHECKPOINT_INTERVAL seconds
+        :param table: name of the table
+        :param offset: number of rows loaded so far
+        """
+        self.tables[table]["offset"] = offset
+        if time.monotonic() - self.saved >= CHECKPOINT_INTERVAL:
+            db_connection.commit()
+            self.save()
+
+    def finish(self, table, offset):
+        """
+        Marks a table as completely loaded
+        :param table: name of the table
+        :param offset: number of rows of the table
+        """
+        db_connection.commit()
+        self.tables[table].update(offset=offset, done=True)
+        self.save()
+
+
+class Sink:
+    """
+    Destination of the tables loaded by build_database
+    """
+
+    def load(self, table, rows):
+        """
+        Loads all rows of a table
+        :param table: name of the table
+        :param rows: rows in the column order of TABLE_COLUMNS
+        :return: number of loaded rows
+        """
+        raise NotImplementedError
+
+    def finish(self):
+        """
+        Called after all tables were loaded
+        """
+
+
+class MySQLSink(Sink):
+    """
+    Loads the tables into the MySQL database with INSERT statements or LOAD DATA LOCAL INFILE
+    """
+
+    def __init__(self, connection, spool_path=None, checkpoint=None):
+        """
+        :param connection: mysql connection
+        :param spool_path: if set, the tables are bulk loaded with LOAD DATA INFILE from spool files in this directory
+        :param checkpoint: LoadCheckpoint to skip the tables and rows loaded by an interrupted load
+        """
+        self.cur = connection.cursor(buffered=True)
+        self.spool_path = spool_path
+        self.checkpoint = checkpoint
+
+    def load(self, table, rows):
+        checkpoint = self.checkpoint
+        if checkpoint is not None and checkpoint.is_done(table):
+            print("Already loaded")
+            return 0
+        start = 0 if checkpoint is None else checkpoint.start(self.cur, table)
+        if self.spool_path is not None:
+            bulk_load_rows(self.cur, table, rows[start:], self.spool_path)
+        elif checkpoint is None:
+            insert_rows(self.cur, table, rows)
+        else:
+            loaded = [start]
+            with progressbar.ProgressBar(max_value=len(rows), initial_value=start) as bar:
+                def progress(count):
+                    loaded[0] += count
+                    bar.update(loaded[0])
+                    checkpoint.update(table, loaded[0])
+
+                insert_rows(self.cur, table, rows, progress=progress, start=start)
+        if checkpoint is not None:
+            checkpoint.finish(table, len(rows))
+        return len(rows) - start
+
+    def finish(self):
+        self.cur.close()
+        if self.checkpoint is not None:
+            self.checkpoint.remove()
+
+
+class SQLiteSink(Sink):
+    """
+    Loads the tables into a SQLite database with the tables of the schema. The journal and syncing are turned off,
+    every table is inserted with one prepared statement in one transaction and the secondary indexes are created
+    after all tables are loaded.
+    """
+
+    def __init__(self, path, schema):
+        """
+        Creates the tables of the schema in the SQLite database, existing tables are dropped
+        :param path: path of the database file
+        :param schema: tables returned by read_schema
+        """
+        self.path = path
+        # The tables are loaded by the thread of the build phase
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.connection.execute("""PRAGMA journal_mode = OFF""")
+        self.connection.execute("""PRAGMA synchronous = OFF""")
+        self.indexes = []
+        for table, definition in schema.items():
+            columns, indexes = sqlite_definitions(table, definition)
+            self.connection.execute("""DROP TABLE IF EXISTS `%s`""" % table)
+            self.connection.execute("""CREATE TABLE `%s` (\n  %s)""" % (table, ",\n  ".join(columns)))
+            self.indexes.extend(indexes)
+
+    def load(self, table, rows):
+        query = insert_query(table).replace("%s", "?")
+        if table in DUPLICATE_KEY_TABLES:
+            query = query.replace("INSERT", "INSERT OR IGNORE", 1)
+        self.connection.execute("""BEGIN""")
+        self.connection.executemany(query, iter(rows))
+        self.connection.execute("""COMMIT""")
+        return len(rows)
+
+    def finish(self):
+        print("\nCreating %d indexes..." % len(self.indexes))
+        for statement in self.indexes:
+            self.connection.execute(statement)
+        self.connection.close()
+        print("SQLite database written to", self.path)
+
+
+class FileSink(Sink):
+    """
+    Writes every table into a tab separated file in the format of the spool files of LOAD DATA INFILE
+    """
+
+    def __init__(self, path):
+        """
+        :param path: directory of the files
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def load(self, table, rows):
+        write_spool_file(os.path.join(self.path, table + ".tsv"), rows)
+        return len(rows)
+
+    def finish(self):
+        print("\nTables written to", self.path)
+
+
+def sqlite_definitions(table, definition):
+    """
+    Converts the MySQL definitions of a table of read_schema to SQLite. Character sets, collations and
+    full text indexes are dropped, enums become text and the AUTO_INCREMENT id becomes the rowid.
+    :param table: name of the table
+    :param definition: dict of the table returned by read_schema
+    :return: tuple of the list of column, key and constraint definitions and the list of CREATE INDEX statements
+    """
+    columns = []
+    rowid = None
+    for column in definition["definitions"]:
+        if SQLITE_AUTO_INCREMENT_REGEX.search(column):
+            rowid = column.split("`")[1]
+            columns.append("`%s` INTEGER PRIMARY KEY" % rowid)
+        elif rowid is not None and column.upper().startswith("PRIMARY KEY"):
+            # The rowid is already the primary key
+            continue
+        else:
+            columns.append(SQLITE_ENUM_REGEX.sub("TEXT", SQLITE_REMOVED_REGEX.sub("", column)))
+    indexes = []
+    for index in definition["indexes"]:
+        match = SQLITE_INDEX_REGEX.match(index)
+        if match is None:
+            continue
+        indexes.append("""CREATE %sINDEX `%s_%s` ON `%s` %s""" % (
+            "UNIQUE " if match.group(1) else "", table, match.group(2), table,
+            SQLITE_PREFIX_LENGTH_REGEX.sub("`", match.group(3))))
+    return columns + definition["constraints"], indexes
+
+
+def build_database(spool_path=None, connections=1, checkpoint=None, sink=None):
     """
     Builds the relational database based on the processed data of the dblp,
     the semantic scholar data and the inst.xml
+    :param spool_path: if set, the tables are bulk loaded with LOAD DATA INFILE from spool files in this directory
+    :param connections: number of database connections used for loading the tables concurrently,
+    only supported without a sink
+    :param checkpoint: LoadCheckpoint to skip the tables and rows loaded by an interrupted load
+    :param sink: Sink the tables are loaded into instead of the MySQL database
+    """
+    print("\nInserting data into database...")
+
+    if sink is not None and connections > 1:
+        raise ValueError("The tables can only be loaded concurrently into the MySQL database")
+    if sink is None:
+        if spool_path is not None:
+            os.makedirs(spool_path, exist_ok=True)
+
+        if connections > 1:
+            load_tables_concurrently(table_data(), connections, spool_path)
+            return
+
+        sink = MySQLSink(db_connection, spool_path, checkpoint)
+
+    for table, description, rows in table_data():
+        print("\n%s:" % description)
+        with instrument("tables", table) as measurement:
+            measurement["rows"] = sink.load(table, rows)
+    sink.finish()
+
+
+def h_index(counts):
+    """
+    :param counts: citation counts of the publications of a person or venue
+    :return: largest h such that h of the publications are cited at least h times
     """
+    h = 0
+    for count in sorted(counts, reverse=True):
+        if count <= h:
+            break
+        h += 1
+    return h
 
+
+def compute_metrics():
+    """
+    Computes the number of citations of every publication from the references and the h-index of every author
+    and the aggregates of every venue from the citations of their publications. The citations are counted on
+    the ids of the interned edge lists, only the publications that are cited at least once are kept.
+    :return: tuple of (dict publication key -> citations, dict person key -> h-index,
+    list of (venue key, publications, citations, h-index) tuples)
+    """
+    strings = string_pool.strings
+    cited = collections.Counter(pub_references_pub2.right)
+
+    author_citations = collections.defaultdict(list)
+    for person, publication in zip(person_authored.left, person_authored.right):
+        count = cited.get(publication)
+        if count:
+            author_citations[person].append(count)
+    h_indexes = {strings[person]: h_index(counts) for person, counts in author_citations.items()}
+
+    citations = {strings[publication]: count for publication, count in cited.items()}
+    venue_citations = collections.defaultdict(list)
+    for row in publications:
+        venue = row[8] or row[9]
+        if venue is not None:
+            venue_citations[venue].append(citations.get(row[0], 0))
+    venues = [(venue, len(counts), sum(counts), h_index(counts)) for venue, counts in venue_citations.items()]
+    return citations, h_indexes, venues
+
+
+def update_column(cur, table, column, values):
+    """
+    Sets a column of all rows of a table in bulk by loading the values into a temporary table
+    and joining it in one UPDATE, rows without a value are set to 0
+    :param cur: cursor of the database connection
+    :param table: name of the table, its key column is dblpKey
+    :param column: name of the updated column
+    :param values: dict of dblpKey -> value
+    """
+    cur.execute("""DROP TEMPORARY TABLE IF EXISTS `metric_values`""")
+    cur.execute("""CREATE TEMPORARY TABLE `metric_values` (
+                    `dblpKey` VARCHAR(100) COLLATE utf8mb4_bin NOT NULL PRIMARY KEY, `value` INT NOT NULL)""")
+    rows = list(values.items())
+    for i in range(0, len(rows), BATCH_SIZE):
+        cur.executemany("""INSERT INTO `metric_values` (`dblpKey`, `value`) VALUES (%s, %s)""",
+                        rows[i:i + BATCH_SIZE])
+    cur.execute("""UPDATE `%s` LEFT JOIN `metric_values` ON `%s`.`dblpKey` = `metric_values`.`dblpKey`
+                    SET `%s`.`%s` = COALESCE(`metric_values`.`value`, 0)""" % (table, table, table, column))
+    cur.execute("""DROP TEMPORARY TABLE `metric_values`""")
+
+
+def build_metrics():
+    """
+    Computes the citation metrics of the loaded data and writes them to the citations of the publications,
+    the h-index of the persons and the venue_metrics table
+    """
+    print("\nComputing citation metrics...")
+    citations, h_indexes, venues = compute_metrics()
     cur = db_connection.cursor()
+    update_column(cur, "publication", "citations", citations)
+    update_column(cur, "person", "h-index", h_indexes)
+    cur.execute("""DELETE FROM `venue_metrics`""")
+    for i in range(0, len(venues), BATCH_SIZE):
+        cur.executemany("""INSERT INTO `venue_metrics` (`venueKey`, `publications`, `citations`, `h-index`)
+                           VALUES (%s, %s, %s, %s)""", venues[i:i + BATCH_SIZE])
+    db_connection.commit()
+    cur.close()
+    print("Citation metrics of %d publications, %d persons and %d venues DONE!" % (
+        len(citations), len(h_indexes), len(venues)))
 
-    ##################################################
-    #                  INSTITUTIONS                  #
-    ##################################################
-
-    print("\nInserting inst data into database...")
-
-    print("\nAdding institution keys...")
-    query = """INSERT INTO `institution` (`key`, `primaryName`, `location`, `country`, `city`, `lat` ,`lon`)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)"""
-    cur.executemany(query, institutions)
-
-    print("\nAdding institution names...")
-    inst_names_list = list(inst_names.items())
-    query = """INSERT INTO `institution_name` (`name`, `institutionKey`) VALUES (%s, %s)"""
-    cur.executemany(query, inst_names_list)
-
-    ##################################################
-    #                      DBLP                      #
-    ##################################################
-    print("\nInserting dblp data into database...")
-
-    print("\nPerson keys:")
-    with progressbar.ProgressBar(max_value=len(person_keys)) as bar:
-        query = """INSERT INTO `person` (`dblpKey`, `orcid`, `primaryName`) VALUES (%s, %s, %s)"""
-        for i in range(0, len(person_keys), BATCH_SIZE):
-            cur.executemany(query, person_keys[i:i + BATCH_SIZE])
-            bar.update(i)
-
-    print("\nAdding person names:")
-    person_names_list = list(person_names.items())
-    with progressbar.ProgressBar(max_value=len(person_names_list)) as bar:
-        query = """INSERT INTO `person_names` (`name`, `personKey`) VALUES (%s, %s)"""
-        for i in range(0, len(person_names_list), BATCH_SIZE):
-            params = [tuple(el) for el in person_names_list[i: i + BATCH_SIZE]]
-            cur.executemany(query, params)
-            bar.update(i)
-
-    print("\nAdding affiliations of persons:")
-    with progressbar.ProgressBar(max_value=len(affiliations)) as bar:
-        query = """INSERT INTO `person_works_for_institution` (`personKey`, `institutionKey`) VALUES (%s, %s)"""
-        for i in range(0, len(affiliations), BATCH_SIZE):
-            cur.executemany(query, affiliations[i:i + BATCH_SIZE])
-            bar.update(i)
-
-    print("\nAdding journals:")
-    journal_key_dict_list = list(journal_key_dict.items())
-    with progressbar.ProgressBar(max_value=len(journal_key_dict_list)) as bar:
-        query = """INSERT INTO `journal` (`dblpKey`, `acronym`) VALUES (%s, %s)"""
-        for i in range(0, len(journal_key_dict_list), BATCH_SIZE):
-            params = [tuple(el) for el in journal_key_dict_list[i: i + BATCH_SIZE]]
-            cur.executemany(query, params)
-            bar.update(i)
-
-    print("\nAdding journal names:")
-    journal_name_dict_list = list(journal_name_dict.items())
-    with progressbar.ProgressBar(max_value=len(journal_name_dict_list)) as bar:
-        query = """INSERT INTO `journal_name` (`name`, `journalKey`) VALUES (%s, %s)"""
-        for i in range(0, len(journal_name_dict_list), BATCH_SIZE):
-            params = [tuple(el) for el in journal_name_dict_list[i: i + BATCH_SIZE]]
-            cur.executemany(query, params)
-            bar.update(i)
-
-    print("\nAdding conferences:")
-    conference_key_dict_values = list(conference_key_dict.values())
-    with progressbar.ProgressBar(max_value=len(conference_key_dict_values)) as bar:
-        query = """INSERT INTO `conference` (`dblpKey`, `acronym`, `name`) VALUES (%s, %s, %s)"""
-        for i in range(0, len(conference_key_dict_values), BATCH_SIZE):
-            try:
-                cur.executemany(query, conference_key_dict_values[i: i + BATCH_SIZE])
-            except mysql.connector.errors.IntegrityError:
-                pass
-            bar.update(i)
-
-    print("\nAdding publications:")
-    with progressbar.ProgressBar(max_value=len(publications)) as bar:
-        query = """INSERT INTO `publication`
-                    (`dblpKey`, `title`, `abstract`, `ee`, `url`, `year`, `volume`, `type`, `conference_dblpKey`, `journal_dblpKey`)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
-        for i in range(0, len(publications), BATCH_SIZE):
-            cur.executemany(query, publications[i:i + BATCH_SIZE])
-            bar.update(i)
-
-    print("\nAdding authors of publications:")
-    with progressbar.ProgressBar(max_value=len(person_authored)) as bar:
-        query = """INSERT INTO `person_authored_publication` (`personKey`, `publicationKey`)
-                            VALUES (%s, %s)"""
-        for i in range(0, len(person_authored), BATCH_SIZE):
-            cur.executemany(query, person_authored[i:i + BATCH_SIZE])
-            bar.update(i)
-
-    print("\nAdding editors of publications:")
-    with progressbar.ProgressBar(max_value=len(person_edited)) as bar:
-        query = """INSERT INTO `person_edited_publication` (`personKey`, `publicationKey`)
-                                VALUES (%s, %s)"""
-        for i in range(0, len(person_edited), BATCH_SIZE):
-            cur.executemany(query, person_edited[i:i + BATCH_SIZE])
-            bar.update(i)
-
-    ##################################################
-    #                       S2                       #
-    ##################################################
-
-    print("\nInserting semantic scholar data into database...")
-    print("\nAdding references:")
-    with progressbar.ProgressBar(max_value=len(pub_references_pub2)) as bar:
-        query = """INSERT INTO `publication_references` (`pub_id`, `pub2_id`) VALUES (%s, %s)"""
-        for i in range(0, len(pub_references_pub2), BATCH_SIZE):
-            cur.executemany(query, pub_references_pub2[i:i + BATCH_SIZE])
-            bar.update(i)
-
-    print("\nAdding keywords:")
-    keyword_list = list(keywords)
-    with progressbar.ProgressBar(max_value=len(keyword_list)) as bar:
-        for i in range(0, len(keyword_list), BATCH_SIZE):
-            query = """INSERT INTO `keyword` (`keyword`) VALUES (%s)"""
-            cur.executemany(query, keyword_list[i:i + BATCH_SIZE])
-            bar.update(i)
-
-    print("\nAdding keywords to publications:")
-    with progressbar.ProgressBar(max_value=len(pub_keywords)) as bar:
-        query = """INSERT INTO `publication_has_keyword` (`dblpKey`, `keyword`) VALUES (%s, %s)"""
-        for i in range(0, len(pub_keywords), BATCH_SIZE):
-            cur.executemany(query, pub_keywords[i:i + BATCH_SIZE])
-            bar.update(i)
 
+def split_definitions(body):
+    """
+    Splits the body of a CREATE TABLE statement into its column, key and constraint definitions
+    :param body: text between the outer parentheses of the statement
+    :return: list of definitions
+    """
+    definitions = []
+    depth = 0
+    start = 0
+    for i, char in enumerate(body):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            definitions.append(body[start:i].strip())
+            start = i + 1
+    definitions.append(body[start:].strip())
+    return [definition for definition in definitions if definition]
+
+
+def read_schema(path=SCHEMA_PATH):
+    """
+    Reads the tables of the schenql-db.sql
+    :param path: path to the schema file
+    :return: dict of table name -> dict with "definitions" (columns and primary key),
+    "indexes" (secondary indexes), "constraints" (foreign keys) and "options" (e.g. the engine)
+    """
+    with open(path) as schema_file:
+        sql = SQL_COMMENT_REGEX.sub("", schema_file.read())
+    schema = {}
+    for match in CREATE_TABLE_REGEX.finditer(sql):
+        table = {"definitions": [], "indexes": [], "constraints": [], "options": match.group(3).strip()}
+        for definition in split_definitions(match.group(2)):
+            # Tables are created in the database of the connection instead of the schema of the file
+            definition = SCHEMA_QUALIFIER_REGEX.sub("", definition)
+            keyword = definition.split(None, 1)[0].upper()
+            if keyword in ("INDEX", "KEY", "FULLTEXT", "UNIQUE", "SPATIAL"):
+                table["indexes"].append(definition)
+            elif keyword == "CONSTRAINT":
+                table["constraints"].append(definition)
+            else:
+                table["definitions"].append(definition)
+        schema[match.group(1)] = table
+    return schema
+
+
+def create_tables(cur, schema, with_indexes=True):
+    """
+    Drops and creates the tables of the schema in the current database
+    :param cur: cursor of the database connection
+    :param schema: tables returned by read_schema
+    :param with_indexes: create the secondary indexes and foreign keys, otherwise only the primary keys are created
+    """
+    for table, definition in schema.items():
+        definitions = definition["definitions"]
+        if with_indexes:
+            definitions = definitions + definition["indexes"] + definition["constraints"]
+        print("CREATE TABLE", table)
+        cur.execute("""DROP TABLE IF EXISTS `%s`""" % table)
+        cur.execute("""CREATE TABLE `%s` (\n  %s)\n%s""" % (table, ",\n  ".join(definitions), definition["options"]))
+
+
+def create_staging_database(cur, database, schema, with_indexes=True):
+    """
+    Drops and creates a database with the tables of the schema to build a new generation of the data
+    without touching the live database
+    :param cur: cursor of the database connection
+    :param database: name of the staging database
+    :param schema: tables returned by read_schema
+    :param with_indexes: create the secondary indexes and foreign keys
+    """
+    cur.execute("""DROP DATABASE IF EXISTS `%s`""" % database)
+    cur.execute("""CREATE DATABASE `%s` DEFAULT CHARACTER SET utf8mb4""" % database)
+    cur.execute("""USE `%s`""" % database)
+    create_tables(cur, schema, with_indexes)
+
+
+def check_row_counts(cur):
+    """
+    Compares the number of rows of the loaded tables with the processed data
+    :param cur: cursor of the database connection
+    :raises ValueError: if a table does not contain all processed rows
+    """
+    mismatches = []
+    for table in TABLE_DESCRIPTIONS:
+        expected = len(table_rows(table))
+        cur.execute("""SELECT COUNT(*) FROM `%s`""" % table)
+        count = cur.fetchone()[0]
+        # Conferences found under different keys in dblp are only loaded once
+        if count != expected and not (table == "conference" and 0 < count <= expected):
+            mismatches.append("%s (%d of %d rows)" % (table, count, expected))
+    if mismatches:
+        raise ValueError("Row counts do not match the processed data: %s" % ", ".join(mismatches))
+    print("Row counts of %d tables validated" % len(TABLE_DESCRIPTIONS))
+
+
+def existing_tables(cur, database):
+    """
+    :param cur: cursor of the database connection
+    :param database: name of the database
+    :return: set of the names of the tables in the database
+    """
+    cur.execute("""SELECT TABLE_NAME FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s""", (database,))
+    return {row[0] for row in cur.fetchall()}
+
+
+def swap_databases(cur, live, staging, previous, tables):
+    """
+    Replaces the tables of the live database by the tables of the staging database in one atomic RENAME TABLE.
+    The replaced tables are moved to a new database, the previous database is only replaced by it after the swap
+    succeeded, so a failed swap keeps the generation to roll back to. The staging database is dropped.
+    :param cur: cursor of the database connection
+    :param live: name of the database of the query service
+    :param staging: name of the staging database
+    :param previous: name of the database keeping the replaced generation
+    :param tables: names of the tables
+    """
+    live_tables = existing_tables(cur, live)
+    replaced = previous + "_new"
+    cur.execute("""DROP DATABASE IF EXISTS `%s`""" % replaced)
+    cur.execute("""CREATE DATABASE `%s` DEFAULT CHARACTER SET utf8mb4""" % replaced)
+    renames = []
+    for table in tables:
+        if table in live_tables:
+            renames.append("`%s`.`%s` TO `%s`.`%s`" % (live, table, replaced, table))
+        renames.append("`%s`.`%s` TO `%s`.`%s`" % (staging, table, live, table))
+    cur.execute("""RENAME TABLE %s""" % ", ".join(renames))
+    cur.execute("""DROP DATABASE `%s`""" % staging)
+
+    # The live database is swapped, the generation before the replaced one is not needed anymore
+    cur.execute("""DROP DATABASE IF EXISTS `%s`""" % previous)
+    cur.execute("""CREATE DATABASE `%s` DEFAULT CHARACTER SET utf8mb4""" % previous)
+    if live_tables & set(tables):
+        cur.execute("""RENAME TABLE %s""" % ", ".join(
+            "`%s`.`%s` TO `%s`.`%s`" % (replaced, table, previous, table) for table in tables if table in live_tables))
+    cur.execute("""DROP DATABASE `%s`""" % replaced)
+    print("Swapped %s into %s, the previous tables are kept in %s" % (staging, live, previous))
+
+
+def rollback_databases(cur, live, previous, tables):
+    """
+    Exchanges the tables of the live and the previous database in one atomic RENAME TABLE,
+    so a second rollback restores the replaced generation again
+    :param cur: cursor of the database connection
+    :param live: name of the database of the query service
+    :param previous: name of the database keeping the previous generation
+    :param tables: names of the tables
+    """
+    live_tables = existing_tables(cur, live)
+    previous_tables = existing_tables(cur, previous)
+    if not previous_tables:
+        print("No previous generation in %s to roll back to" % previous)
+        return
+    swap = live + "_rollback"
+    cur.execute("""DROP DATABASE IF EXISTS `%s`""" % swap)
+    cur.execute("""CREATE DATABASE `%s` DEFAULT CHARACTER SET utf8mb4""" % swap)
+    renames = []
+    for table in tables:
+        if table in live_tables:
+            renames.append("`%s`.`%s` TO `%s`.`%s`" % (live, table, swap, table))
+        if table in previous_tables:
+            renames.append("`%s`.`%s` TO `%s`.`%s`" % (previous, table, live, table))
+        if table in live_tables:
+            renames.append("`%s`.`%s` TO `%s`.`%s`" % (swap, table, previous, table))
+    cur.execute("""RENAME TABLE %s""" % ", ".join(renames))
+    cur.execute("""DROP DATABASE `%s`""" % swap)
+    print("Rolled %s back to the tables of %s" % (live, previous))
+
+
+def index_name(definition):
+    """
+    :param definition: definition of an index like INDEX `name_idx` (`name`)
+    :return: name of the index
+    """
+    return re.search(r"`([^`]+)`", definition).group(1)
+
+
+def build_index(cur, table, definitions, sort_buffer):
+    """
+    Adds the secondary indexes of a table which do not exist yet in a single ALTER TABLE,
+    so the table is only rebuilt once. Existing indexes are skipped, so an interrupted build can be resumed.
+    :param cur: cursor of the database connection
+    :param table: name of the table
+    :param definitions: definitions of the secondary indexes
+    :param sort_buffer: size of the sort buffers used for building the indexes in bytes
+    :return: names of the created indexes
+    """
+    cur.execute("""SHOW INDEX FROM `%s`""" % table)
+    existing = {row[2] for row in cur.fetchall()}
+    missing = [definition for definition in definitions if index_name(definition) not in existing]
+    if not missing:
+        return []
+    cur.execute("""SET SESSION myisam_sort_buffer_size = %s""", (sort_buffer,))
+    cur.execute("""SET SESSION sort_buffer_size = %s""", (sort_buffer,))
+    cur.execute("""ALTER TABLE `%s` %s""" % (table, ", ".join("ADD " + definition for definition in missing)))
+    return [index_name(definition) for definition in missing]
+
+
+def build_indexes(schema, connections, sort_buffer):
+    """
+    Builds the secondary indexes of all tables after the data was loaded, the tables are processed in parallel
+    :param schema: tables returned by read_schema
+    :param connections: number of tables indexed at the same time
+    :param sort_buffer: size of the sort buffers used for building the indexes in bytes
+    """
+    print("\nBuilding indexes...")
+    pool = ConnectionPool(connections)
+
+    def index_table(table):
+        start = time.time()
+        with pool.connection() as connection:
+            cur = connection.cursor(buffered=True)
+            created = build_index(cur, table, schema[table]["indexes"], sort_buffer)
+            cur.close()
+        if created:
+            print("Built %s on %s in %.1f s" % (", ".join(created), table, time.time() - start))
+
+    # Start with the largest tables as they take the longest
+    sizes = {table: len(rows) for table, _, rows in table_data()}
+    tables = sorted((table for table in schema if schema[table]["indexes"]), key=lambda table: -sizes.get(table, 0))
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=connections) as executor:
+            for future in [executor.submit(index_table, table) for table in tables]:
+                future.result()
+    finally:
+        pool.close()
+    print("Building indexes DONE!")
+
+
+def compute_fingerprints(tables):
+    """
+    Computes a content fingerprint for every entity of DELTA_ENTITIES from the rows of all its tables.
+    The fingerprint is the sum of the hashes of the rows, so it does not depend on the order of the rows.
+    :param tables: dict of the rows by table name
+    :return: dict of entity -> dict of key -> fingerprint
+    """
+    fingerprints = {}
+    for entity, entity_tables in DELTA_ENTITIES.items():
+        entity_fingerprints = {}
+        for table, _, key_index in entity_tables:
+            for row in tables[table]:
+                row_hash = int.from_bytes(hashlib.blake2b(repr((table, row)).encode(), digest_size=8).digest(),
+                                          "little")
+                key = row[key_index]
+                entity_fingerprints[key] = (entity_fingerprints.get(key, 0) + row_hash) & 0xFFFFFFFFFFFFFFFF
+        fingerprints[entity] = entity_fingerprints
+    return fingerprints
+
+
+def load_fingerprints(path):
+    """
+    Loads the fingerprints of the previous build
+    :param path: path to the fingerprint file
+    :return: fingerprints or None if there was no previous build
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as fingerprint_file:
+        return pickle.load(fingerprint_file)
+
+
+def save_fingerprints(path, fingerprints):
+    """
+    Atomically replaces the fingerprint file with the fingerprints of the current build
+    :param path: path to the fingerprint file
+    :param fingerprints: fingerprints computed by compute_fingerprints
+    """
+    with open(path + ".tmp", "wb") as fingerprint_file:
+        pickle.dump(fingerprints, fingerprint_file, pickle.HIGHEST_PROTOCOL)
+    os.replace(path + ".tmp", path)
+
+
+def delete_rows(cur, table, column, keys):
+    """
+    Deletes all rows of a table where the column matches one of the keys
+    :param cur: cursor of the database connection
+    :param table: name of the table
+    :param column: name of the key column
+    :param keys: list of keys
+    """
+    for i in range(0, len(keys), BATCH_SIZE):
+        batch = keys[i:i + BATCH_SIZE]
+        cur.execute("""DELETE FROM `%s` WHERE `%s` IN (%s)""" % (table, column, ", ".join(["%s"] * len(batch))),
+                    batch)
+
+
+def build_database_delta(fingerprint_path, spool_path=None, full=False):
+    """
+    Updates the database with the changes since the previous build. Entities are compared by the fingerprints
+    of their rows, only the rows of new, changed and removed entities are deleted and inserted.
+    If there are no fingerprints of a previous build the whole database is built, which needs empty tables.
+    :param fingerprint_path: path to the fingerprint file of the previous build
+    :param spool_path: bulk load mode of build_database for a full build
+    :param full: ignore the fingerprints of the previous build, e.g. because the database was cleared
+    """
+    tables = {table: rows for table, _, rows in table_data()}
+    fingerprints = compute_fingerprints(tables)
+    previous = None if full else load_fingerprints(fingerprint_path)
+
+    if previous is None:
+        print("\nNo fingerprints of a previous build found, building the whole database...")
+        build_database(spool_path)
+        save_fingerprints(fingerprint_path, fingerprints)
+        return
+
+    print("\nUpdating database with the changes since the previous build...")
+    cur = db_connection.cursor()
+    for entity, entity_tables in DELTA_ENTITIES.items():
+        current_keys = fingerprints[entity]
+        previous_keys = previous.get(entity, {})
+        added = current_keys.keys() - previous_keys.keys()
+        removed = previous_keys.keys() - current_keys.keys()
+        changed = {key for key, fingerprint in current_keys.items()
+                   if key in previous_keys and previous_keys[key] != fingerprint}
+        print("\n%s: %d added, %d changed, %d removed" % (entity, len(added), len(changed), len(removed)))
+
+        outdated = list(removed | changed)
+        updated = added | changed
+        for table, column, key_index in entity_tables:
+            delete_rows(cur, table, column, outdated)
+            insert_rows(cur, table, [row for row in tables[table] if row[key_index] in updated])
+        db_connection.commit()
     cur.close()
 
+    save_fingerprints(fingerprint_path, fingerprints)
+
+
+def input_fingerprint(data_path):
+    """
+    Hashes the input files of the processing phases and the subset_filter. The single files are hashed by their
+    content, the semantic scholar dataset by the names, sizes and modification times of its files.
+    :param data_path: path of the data directory
+    :return: hex digest
+    """
+    fingerprint = hashlib.blake2b(SNAPSHOT_VERSION, digest_size=16)
+    # A subset build processes the same files into different data
+    fingerprint.update(repr(subset_filter).encode())
+    for name in ("dblp.xml.gz", "dblp.dtd", "inst.xml", "conferences.xml"):
+        fingerprint.update(name.encode())
+        path = os.path.join(data_path, name)
+        if os.path.exists(path):
+            with open(path, "rb") as input_file:
+                for chunk in iter(functools.partial(input_file.read, 1024 * 1024), b""):
+                    fingerprint.update(chunk)
+    s2_path = os.path.join(data_path, "s2-aux")
+    for root, dirs, files in os.walk(s2_path):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            fingerprint.update(("%s %d %d\n" % (os.path.relpath(path, s2_path), stat.st_size,
+                                                 stat.st_mtime_ns)).encode())
+    return fingerprint.hexdigest()
+
+
+def write_columns(path, rows, columns):
+    """
+    Writes rows in a columnar binary format. Integer columns are stored as an array of int64,
+    all other columns as an array of offsets into a blob of utf-8 strings. Every column has a bitmap of NULLs.
+    The rows are read once and the strings are spooled to temporary files, so e.g. the abstracts of an
+    AbstractStore are not held in memory.
+    :param path: path of the file
+    :param rows: list of tuples
+    :param columns: names of the columns
+    """
+    width = len(columns)
+    nulls = [bytearray() for _ in range(width)]
+    # Columns are integer columns until the first other value, then they are converted to strings
+    ints = [array.array("q") for _ in range(width)]
+    offsets = [None] * width
+    spools = [None] * width
+
+    with contextlib.ExitStack() as stack:
+        def convert(index):
+            spool = spools[index] = stack.enter_context(tempfile.TemporaryFile(dir=os.path.dirname(path) or None))
+            column_offsets = offsets[index] = array.array("Q", [0])
+            for value, null in zip(ints[index], nulls[index]):
+                encoded = b"" if null else str(value).encode("utf-8")
+                spool.write(encoded)
+                column_offsets.append(column_offsets[-1] + len(encoded))
+            ints[index] = None
+
+        for row in rows:
+            for index in range(width):
+                value = row[index]
+                column_ints = ints[index]
+                if value is None:
+                    nulls[index].append(1)
+                    if column_ints is not None:
+                        column_ints.append(0)
+                    else:
+                        offsets[index].append(offsets[index][-1])
+                    continue
+                if column_ints is not None:
+                    if type(value) is int:
+                        nulls[index].append(0)
+                        column_ints.append(value)
+                        continue
+                    convert(index)
+                nulls[index].append(0)
+                encoded = str(value).encode("utf-8")
+                spools[index].write(encoded)
+                offsets[index].append(offsets[index][-1] + len(encoded))
+
+        header = {"rows": len(nulls[0]) if width else len(rows), "columns": []}
+        position = 0
+        for index, name in enumerate(columns):
+            column = {"name": name, "nulls": position}
+            position += len(nulls[index])
+            if ints[index] is not None:
+                column["type"] = "int"
+                column["data"] = position
+                position += len(ints[index]) * ints[index].itemsize
+            else:
+                column["type"] = "str"
+                column["offsets"] = position
+                position += len(offsets[index]) * offsets[index].itemsize
+                column["data"] = position
+                position += offsets[index][-1]
+            header["columns"].append(column)
+
+        header_bytes = json.dumps(header).encode()
+        with open(path, "wb") as column_file:
+            column_file.write(SNAPSHOT_MAGIC)
+            column_file.write(len(header_bytes).to_bytes(8, "little"))
+            column_file.write(header_bytes)
+            for index in range(width):
+                column_file.write(nulls[index])
+                if ints[index] is not None:
+                    ints[index].tofile(column_file)
+                else:
+                    offsets[index].tofile(column_file)
+                    spools[index].seek(0)
+                    shutil.copyfileobj(spools[index], column_file)
+
+
+def read_columns(path):
+    """
+    Reads rows written by write_columns from a memory-mapped file
+    :param path: path of the file
+    :return: list of tuples
+    """
+    with open(path, "rb") as column_file:
+        if os.fstat(column_file.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(column_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if mapped[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                raise ValueError("%s is not a snapshot file" % path)
+            header_length = int.from_bytes(mapped[len(SNAPSHOT_MAGIC):len(SNAPSHOT_MAGIC) + 8], "little")
+            base = len(SNAPSHOT_MAGIC) + 8 + header_length
+            header = json.loads(mapped[len(SNAPSHOT_MAGIC) + 8:base].decode())
+            count = header["rows"]
+            view = memoryview(mapped)
+            try:
+                columns = []
+                for column in header["columns"]:
+                    nulls = view[base + column["nulls"]:base + column["nulls"] + count]
+                    if column["type"] == "int":
+                        values = view[base + column["data"]:base + column["data"] + 8 * count].cast("q").tolist()
+                    else:
+                        offsets = view[base + column["offsets"]:base + column["offsets"] + 8 * (count + 1)].cast("Q")
+                        data = base + column["data"]
+                        values = [mapped[data + offsets[i]:data + offsets[i + 1]].decode("utf-8")
+                                  for i in range(count)]
+                        offsets.release()
+                    columns.append([None if null else value for value, null in zip(values, nulls)])
+                    nulls.release()
+            finally:
+                view.release()
+    return list(zip(*columns)) if columns else [() for _ in range(count)]
+
+
+def restore_table(table, rows):
+    """
+    Replaces the data of a table in the global variables
+    :param table: name of the table
+    :param rows: list of tuples like returned by table_data
+    """
+    if table == "conference":
+        conference_key_dict.clear()
+        conference_key_dict.update((row[0], row) for row in rows)
+    elif table == "keyword":
+        keywords.clear()
+        keywords.update(rows)
+    else:
+        collection = {
+            "institution": institutions,
+            "institution_name": inst_names,
+            "person": person_keys,
+            "person_names": person_names,
+            "person_works_for_institution": affiliations,
+            "journal": journal_key_dict,
+            "journal_name": journal_name_dict,
+            "publication": publications,
+            "person_authored_publication": person_authored,
+            "person_edited_publication": person_edited,
+            "publication_references": pub_references_pub2,
+            "publication_has_keyword": pub_keywords,
+        }[table]
+        collection.clear()
+        if isinstance(collection, dict):
+            collection.update(rows)
+        else:
+            collection.extend(rows)
+
+
+def save_snapshot(cache_path, fingerprint):
+    """
+    Saves the processed data of all tables to the snapshot cache, older snapshots are removed
+    :param cache_path: directory of the snapshot cache
+    :param fingerprint: fingerprint of the input files
+    """
+    print("\nSaving snapshot of the processed data...")
+    os.makedirs(cache_path, exist_ok=True)
+    temp_path = tempfile.mkdtemp(prefix="snapshot-", dir=cache_path)
+    for table, _, rows in table_data():
+        write_columns(os.path.join(temp_path, table + ".col"), rows, TABLE_COLUMNS[table])
+    snapshot_path = os.path.join(cache_path, fingerprint)
+    shutil.rmtree(snapshot_path, ignore_errors=True)
+    os.rename(temp_path, snapshot_path)
+    for name in os.listdir(cache_path):
+        if name != fingerprint:
+            shutil.rmtree(os.path.join(cache_path, name), ignore_errors=True)
+
+
+def load_snapshot(cache_path, fingerprint):
+    """
+    Restores the processed data of all tables from the snapshot cache
+    :param cache_path: directory of the snapshot cache
+    :param fingerprint: fingerprint of the input files
+    :return: True if a snapshot for the input files was found
+    """
+    snapshot_path = os.path.join(cache_path, fingerprint)
+    if not os.path.isdir(snapshot_path):
+        return False
+    print("\nLoading snapshot of the processed data from %s..." % snapshot_path)
+    for table in TABLE_COLUMNS:
+        restore_table(table, read_columns(os.path.join(snapshot_path, table + ".col")))
+    return True
+
 
 def main():
     # Parsing command-line arguments
     parser = argparse.ArgumentParser(description="Bulding relational database from DBLP-xml file")
     parser.add_argument("-d", "--download", action="store_true", help="Download the current version of the DBLP")
     parser.add_argument("-c", "--cleardatabase", action="store_true", help="TRUNCATES ALL TABLES!!!")
+    parser.add_argument("-s", "--stream", action="store_true",
+                        help="Stream the dblp data into the database while parsing")
+    parser.add_argument("--stream-memory", type=int, default=512, metavar="MB",
+                        help="Maximum memory used by queued rows in streaming mode (default: 512)")
+    parser.add_argument("-b", "--bulk", action="store_true",
+                        help="Bulk load the tables with LOAD DATA LOCAL INFILE from spool files in DATA-PATH/spool")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="Number of processes used for parsing the data (default: 1)")
+    parser.add_argument("--parser", choices=("iterparse", "target"), default="iterparse",
+                        help="Engine for parsing the dblp.xml, target extracts the records without building "
+                             "element trees (default: iterparse)")
+    parser.add_argument("--connections", type=int, default=1,
+                        help="Number of database connections used for loading the tables (default: 1)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of processing phases and table loads run concurrently, the table loads use "
+                             "the database connections of --connections (default: 1)")
+    parser.add_argument("--delta", action="store_true",
+                        help="Only apply the changes since the previous build to the database, the first build "
+                             "with --delta needs -c")
+    parser.add_argument("--cache", action="store_true",
+                        help="Reuse the processed data from DATA-PATH/cache if the input files did not change")
+    parser.add_argument("--tee", action="store_true",
+                        help="Parse the dblp.xml.gz while it is downloaded")
+    parser.add_argument("--deferred-indexes", action="store_true",
+                        help="RECREATES ALL TABLES without secondary indexes and builds the indexes after loading")
+    parser.add_argument("--build-indexes", action="store_true",
+                        help="Only build the missing secondary indexes, e.g. after an interrupted build")
+    parser.add_argument("--sort-buffer", type=int, default=256, metavar="MB",
+                        help="Size of the sort buffers for building indexes (default: 256)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Checkpoint the database load in DATA-PATH/load-checkpoint.json and resume an "
+                             "interrupted load of the same input files and --validate option")
+    parser.add_argument("--validate", action="store_true",
+                        help="Remove duplicates and rows with unknown references before loading, write them to "
+                             "DATA-PATH/quarantine and load without foreign key and unique checks")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Compute the citations of the publications, the h-index of the persons and the "
+                             "venue_metrics after loading")
+    parser.add_argument("--abstract-store", action="store_true",
+                        help="Keep the abstracts in DATA-PATH/abstracts.blob instead of in memory")
+    parser.add_argument("--years", type=parse_years, metavar="FROM-TO",
+                        help="Only build the publications of these years, e.g. 2015-2020 or 2015-")
+    parser.add_argument("--types", type=lambda value: value.split(","), metavar="TYPE,...",
+                        help="Only build publications of these types, e.g. article,inproceedings")
+    parser.add_argument("--venues", type=lambda value: value.split(","), metavar="PREFIX,...",
+                        help="Only build publications of venues with these key prefixes, e.g. conf/sigmod")
+    parser.add_argument("--sample", type=float, metavar="RATE",
+                        help="Only build a deterministic sample of this fraction of the publications, e.g. 0.01")
+    parser.add_argument("--sink", choices=("mysql", "sqlite", "file"), default="mysql",
+                        help="Load the tables into the MySQL database, a SQLite database or tab separated files "
+                             "(default: mysql)")
+    parser.add_argument("--sink-path", metavar="PATH",
+                        help="SQLite database or directory of the files of --sink "
+                             "(default: DATA-PATH/schenql-db.sqlite or DATA-PATH/tables)")
+    parser.add_argument("--staging", action="store_true",
+                        help="Build into the database DB_staging and swap it with DB once the row counts are "
+                             "validated, the replaced tables are kept in DB_previous")
+    parser.add_argument("--rollback", action="store_true",
+                        help="Exchange the tables of DB and DB_previous and exit")
+    parser.add_argument("--report", metavar="FILE", help="Write a JSON report of the phases and table loads")
+    parser.add_argument("--prometheus", metavar="FILE",
+                        help="Write the metrics of the report to a Prometheus textfile")
+    parser.add_argument("--profile", metavar="FILE", help="Profile the parsing of the dblp and write the stats")
     args = parser.parse_args()
+    if args.stream and (args.delta or args.cache):
+        parser.error("--stream can not be combined with --delta or --cache")
+    if args.deferred_indexes and args.delta:
+        parser.error("--deferred-indexes can not be combined with --delta")
+    if args.tee and args.cache:
+        parser.error("--tee can not be combined with --cache")
+    if (args.validate or args.metrics) and args.stream:
+        parser.error("--validate and --metrics can not be combined with --stream")
+    if args.resume and (args.stream or args.delta or args.tee or args.connections > 1):
+        parser.error("--resume can not be combined with --stream, --delta, --tee or --connections")
+    if args.jobs > 1 and (args.stream or args.delta or args.resume):
+        parser.error("--jobs can not be combined with --stream, --delta or --resume")
+    subset = args.years or args.types or args.venues or args.sample is not None
+    if subset and args.stream:
+        parser.error("--years, --types, --venues and --sample can not be combined with --stream")
+    if args.sample is not None and not 0 < args.sample <= 1:
+        parser.error("--sample has to be between 0 and 1")
+    if args.staging and (args.stream or args.delta or args.resume or args.cleardatabase):
+        parser.error("--staging can not be combined with --stream, --delta, --resume or --cleardatabase")
+
+    if args.sink != "mysql" and (args.cleardatabase or args.stream or args.bulk or args.delta or args.resume
+                                 or args.deferred_indexes or args.build_indexes or args.metrics or args.staging
+                                 or args.rollback or args.connections > 1):
+        parser.error("--sink %s only supports the processing options" % args.sink)
+    if args.sink != "mysql" and args.jobs > 1:
+        print("--sink %s loads the tables one after another, --jobs only runs the processing phases concurrently"
+              % args.sink)
 
     # Reading config file
     config = configparser.ConfigParser()
@@ -505,38 +3227,212 @@ def main():
     if not os.path.exists(os.path.join(data_path, "dblp.xml.gz")):
         download = True
         print("DBLP file not available. Current version of DBLP will be downloaded.")
-    if download:
+    if download and not args.tee:
         download_dblp(dblp_url, dblp_dtd_url, data_path)
 
     # Connect to database
-    global db_connection
-    db_connection = mysql.connector.connect(
+    global db_connection, abstract_store, subset_filter, concurrent_measurements
+    concurrent_measurements = args.jobs > 1
+    if subset:
+        subset_filter = SubsetFilter(args.years, args.types, args.venues, args.sample)
+        print("Building a subset:", subset_filter)
+    db_config.update(
         host=config["DATABASE"]["HOST"],
         user=config["DATABASE"]["USER"],
         passwd=config["DATABASE"]["PASS"],
-        database=config["DATABASE"]["DB"]
+        database=config["DATABASE"]["DB"],
+        allow_local_infile=args.bulk
     )
+    if args.validate:
+        # The validated tables do not violate any constraint
+        db_config["init_command"] = "SET FOREIGN_KEY_CHECKS=0, UNIQUE_CHECKS=0"
+    db_connection = connect_db() if args.sink == "mysql" else None
+
+    schema = read_schema()
+    sink = None
+    if args.sink == "sqlite":
+        sink = SQLiteSink(args.sink_path or os.path.join(data_path, "schenql-db.sqlite"), schema)
+    elif args.sink == "file":
+        sink = FileSink(args.sink_path or os.path.join(data_path, "tables"))
+    live_database = db_config["database"]
+    staging_database = live_database + "_staging"
+    previous_database = live_database + "_previous"
+    if args.rollback:
+        cur = db_connection.cursor(buffered=True)
+        rollback_databases(cur, live_database, previous_database, schema)
+        cur.close()
+        db_connection.close()
+        return
+    if args.build_indexes:
+        build_indexes(schema, args.connections, args.sort_buffer * 1024 * 1024)
+        db_connection.close()
+        return
+
+    fingerprint_path = os.path.join(data_path, "fingerprints.pickle")
+    if args.delta and not args.cleardatabase and not os.path.exists(fingerprint_path):
+        # The whole database is built without fingerprints, the rows in the tables would be loaded twice
+        raise ValueError("No fingerprints of a previous build found in %s, clear the tables with -c for the "
+                         "first --delta build" % fingerprint_path)
+
+    checkpoint = None
+    if args.resume:
+        # --validate removes rows before they are loaded, which shifts the rows of the resumed tables
+        checkpoint = LoadCheckpoint(os.path.join(data_path, "load-checkpoint.json"), input_fingerprint(data_path),
+                                    {"validate": args.validate})
 
     # Cleanup database
-    if args.cleardatabase:
+    if checkpoint is not None and args.cleardatabase:
+        # The tables are emptied, so the progress of the previous load is lost
+        checkpoint.reset()
+    if checkpoint is not None and checkpoint.stale:
+        # The rows of the interrupted load can not be matched with the new input files or options
+        raise ValueError("The input files or --validate changed since the interrupted load, "
+                         "clear the tables with -c or build into a --staging database without --resume")
+    # The tables of the interrupted load keep their rows and are still without secondary indexes
+    resuming = checkpoint is not None and bool(checkpoint.tables)
+    if args.staging:
+        print("Creating staging database %s..." % staging_database)
+        cur = db_connection.cursor()
+        create_staging_database(cur, staging_database, schema, with_indexes=not args.deferred_indexes)
+        cur.close()
+        db_connection.close()
+        db_config["database"] = staging_database
+        db_connection = connect_db()
+    elif args.deferred_indexes and resuming:
+        print("Resuming the load into the tables without secondary indexes...")
+    elif args.deferred_indexes:
+        print("Creating tables without secondary indexes...")
+        cur = db_connection.cursor()
+        create_tables(cur, schema, with_indexes=False)
+        cur.close()
+    elif args.cleardatabase:
         cleanup_db()
 
     # Build database
     start = time.time()
     print("\n###############################\nStart %s\n###############################\n" % (time.ctime()))
 
-    process_institution_data(data_path)
-    process_s2_data(data_path)
-    process_conference_names(data_path)
-    process_dblp(data_path)
-    build_database()
+    cache_path = os.path.join(data_path, "cache")
+    fingerprint = None
+    if args.cache:
+        fingerprint = input_fingerprint(data_path) if checkpoint is None else checkpoint.fingerprint
+    spool_path = os.path.join(data_path, "spool") if args.bulk else None
+
+    def institution_phase():
+        with instrument("phases", "process_institution_data", os.path.join(data_path, "inst.xml")) as measurement:
+            process_institution_data(data_path)
+            measurement["rows"] = len(institutions)
+
+    def s2_phase():
+        with instrument("phases", "process_s2_data") as measurement:
+            measurement["rows"] = process_s2_data(data_path, args.workers, measurement)
+
+    def conference_phase():
+        with instrument("phases", "process_conference_names",
+                        os.path.join(data_path, "conferences.xml")) as measurement:
+            process_conference_names(data_path)
+            measurement["rows"] = len(conference_names)
+
+    def dblp_phase():
+        # The download is only started when the parser is ready to read it
+        dblp_source = download_dblp(dblp_url, dblp_dtd_url, data_path, tee=True) if download and args.tee else None
+        profiler = cProfile.Profile() if args.profile else None
+        with instrument("phases", "process_dblp", os.path.join(data_path, "dblp.xml.gz")) as measurement:
+            if profiler is not None:
+                profiler.enable()
+            if args.stream:
+                loader = StreamingLoader(STREAMED_TABLES, args.stream_memory * 1024 * 1024, data_path)
+                measurement["rows"] = process_dblp(data_path, loader, engine=args.parser, source=dblp_source)
+                loader.close()
+            else:
+                measurement["rows"] = process_dblp(data_path, workers=args.workers, engine=args.parser,
+                                                   source=dblp_source)
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(args.profile)
+                print("Profile of the dblp parsing written to", args.profile)
+
+    def validate_phase():
+        with instrument("phases", "validate_tables") as measurement:
+            validate_tables(os.path.join(data_path, "quarantine"))
+            measurement["rows"] = sum(len(rows) for _, _, rows in table_data())
+
+    def build_phase():
+        with instrument("phases", "build_database") as measurement:
+            if args.delta:
+                build_database_delta(fingerprint_path, spool_path, full=args.cleardatabase)
+            else:
+                build_database(spool_path, args.connections, checkpoint, sink)
+            measurement["rows"] = sum(len(rows) for _, _, rows in table_data())
+
+    def metrics_phase():
+        with instrument("phases", "build_metrics") as measurement:
+            build_metrics()
+            measurement["rows"] = len(pub_references_pub2)
+
+    # Only the dblp depends on the other inputs, a table is loaded as soon as the data it needs is ready
+    graph = TaskGraph()
+    if fingerprint is None or not load_snapshot(cache_path, fingerprint):
+        if args.abstract_store:
+            abstract_store = AbstractStore(os.path.join(data_path, "abstracts"))
+            abstract_store.open()
+        graph.add("process_institution_data", institution_phase)
+        graph.add("process_s2_data", s2_phase)
+        graph.add("process_conference_names", conference_phase)
+        # The shard workers are forked with a copy of the processed data, no other thread may run meanwhile
+        graph.add("process_dblp", dblp_phase,
+                  ("process_institution_data", "process_s2_data", "process_conference_names"),
+                  exclusive=args.workers > 1)
+        if fingerprint is not None:
+            graph.add("save_snapshot", functools.partial(save_snapshot, cache_path, fingerprint), list(graph.tasks))
+    if args.validate:
+        graph.add("validate_tables", validate_phase, list(graph.tasks))
+    pool = None
+    if args.jobs > 1 and sink is None:
+        if spool_path is not None:
+            os.makedirs(spool_path, exist_ok=True)
+        print("\nInserting data into database...")
+        pool = ConnectionPool(args.connections)
+        for table in TABLE_COLUMNS:
+            if args.validate:
+                dependencies = ("validate_tables",)
+            else:
+                phase = TABLE_PHASES[table]
+                if subset_filter is not None and phase == "process_s2_data":
+                    # The references and keywords are pruned to the publications of the subset with the dblp
+                    phase = "process_dblp"
+                dependencies = [phase] if phase in graph.tasks else []
+            graph.add(table, functools.partial(load_table, pool, table, spool_path), dependencies)
+    else:
+        graph.add("build_database", build_phase, list(graph.tasks))
+    if args.metrics:
+        graph.add("build_metrics", metrics_phase, list(graph.tasks))
+    try:
+        graph.run(args.jobs)
+    finally:
+        if pool is not None:
+            pool.close()
+    if args.deferred_indexes:
+        with instrument("phases", "build_indexes"):
+            build_indexes(schema, args.connections, args.sort_buffer * 1024 * 1024)
+    if args.staging:
+        cur = db_connection.cursor(buffered=True)
+        check_row_counts(cur)
+        swap_databases(cur, live_database, staging_database, previous_database, schema)
+        cur.close()
 
     print("\n###############################\nEnd %s\n###############################\n" % (time.ctime()))
     end = time.time()
     print("Time spent:", end - start, "s")
 
+    if args.report:
+        write_report(args.report)
+    if args.prometheus:
+        write_prometheus_report(args.prometheus)
+
     # Closing connection to database
-    db_connection.close()
+    if db_connection is not None:
+        db_connection.close()
 
 
 if __name__ == '__main__':